@@ -13,6 +13,7 @@ from config_package import settings
 
 # Роутеры и Шедулер
 from scheduler import scheduler_start
+from modules_common.ozon_http import close_session
 from handlers import router as handlers_router
 # Явные импорты, так как __init__.py может отсутствовать или быть неполным
 from routers.start import start_router
@@ -85,6 +86,7 @@ async def main():
     except Exception as e:
         log.error(f"Polling error: {e}")
     finally:
+        await close_session()
         await bot.session.close()
 
 
@@ -7,9 +7,24 @@ import json
 import logging
 import os
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # опциональная зависимость — фолбэк на stdlib json
+    orjson = None
+
 log = logging.getLogger("seller-bot.json_utils")
 
 
+def _dumps(payload: dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # то, что orjson не сериализует (int > 64 бит и т.п.), отдаём stdlib
+            pass
+    return json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+
+
 def safe_read_json(path: str) -> dict:
     """
     Безопасное чтение JSON файла.
@@ -22,8 +37,9 @@ def safe_read_json(path: str) -> dict:
     """
     try:
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(path, "rb") as f:
+                raw = f.read()
+                data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
                 log.debug(f"Successfully read JSON from {path}")
                 return data or {}
     except json.JSONDecodeError as e:
@@ -53,8 +69,9 @@ def safe_write_json(path: str, payload: dict) -> bool:
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        data = _dumps(payload)
+        with open(path, "wb") as f:
+            f.write(data)
 
         log.debug(f"Successfully wrote JSON to {path}")
         return True
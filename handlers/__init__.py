@@ -1,6 +1,7 @@
 # handlers/__init__.py
 from __future__ import annotations
 
+import asyncio
 import os
 from time import monotonic
 from typing import Any, Dict, Tuple
@@ -114,15 +115,18 @@ router.include_router(shipments_demand_router)
 @router.callback_query(F.data == "nav:home")
 async def on_nav_home(cb: CallbackQuery, state: FSMContext) -> None:
     """Всегда возвращает в главное меню и очищает локальное состояние."""
-    await _ack(cb)
+    ack = asyncio.create_task(_ack(cb))
     if _is_rapid_duplicate(cb):
+        await ack
         return
     try:
         await state.clear()
     except Exception:
         pass
     await state.update_data(step="home")
-    await _safe_edit(cb, "🏠 Главное меню — выберите раздел:", reply_markup=main_menu())
+    await asyncio.gather(
+        ack, _safe_edit(cb, "🏠 Главное меню — выберите раздел:", reply_markup=main_menu())
+    )
 
 
 # ✅ Корневой обработчик раздела «Отгрузки»
@@ -133,11 +137,14 @@ async def on_shipments_root(cb: CallbackQuery, state: FSMContext) -> None:
     чтобы обработчик «Назад» корректно работал.
     Также сбрасываем вид для «Статуса отгрузок» на 'sku' — дефолт.
     """
-    await _ack(cb)
+    ack = asyncio.create_task(_ack(cb))
     if _is_rapid_duplicate(cb):
+        await ack
         return
     await state.update_data(step="ship_root", ship_view="sku")
-    await _safe_edit(cb, "🚚 Отгрузки — выберите действие:", reply_markup=shipments_menu())
+    await asyncio.gather(
+        ack, _safe_edit(cb, "🚚 Отгрузки — выберите действие:", reply_markup=shipments_menu())
+    )
 
 
 @router.callback_query(F.data == "nav:back")
@@ -146,8 +153,9 @@ async def on_nav_back(cb: CallbackQuery, state: FSMContext) -> None:
     ЕДИНЫЙ обработчик «Назад».
     Опираться на state["step"] (если есть) и на признаки активного раздела.
     """
-    await _ack(cb)
+    ack = asyncio.create_task(_ack(cb))
     if _is_rapid_duplicate(cb):
+        await ack
         return
 
     data: dict[str, Any] = await state.get_data()
@@ -161,30 +169,40 @@ async def on_nav_back(cb: CallbackQuery, state: FSMContext) -> None:
         or step == "sales_root"
     ):
         await state.update_data(step="sales_root")
-        await _safe_edit(cb, "📈 Продажи — выберите раздел:", reply_markup=sales_menu())
+        await asyncio.gather(
+            ack, _safe_edit(cb, "📈 Продажи — выберите раздел:", reply_markup=sales_menu())
+        )
         return
 
     # Выкупы
     if step.startswith("buyouts") or step == "buyouts_root":
         await state.update_data(step="buyouts_root")
-        await _safe_edit(cb, "🏷️ Выкупы — выберите действие:", reply_markup=buyouts_menu())
+        await asyncio.gather(
+            ack, _safe_edit(cb, "🏷️ Выкупы — выберите действие:", reply_markup=buyouts_menu())
+        )
         return
 
     # Отгрузки
     if step.startswith("ship_") or step == "ship_root":
         await state.update_data(step="ship_root")
-        await _safe_edit(cb, "🚚 Отгрузки — выберите действие:", reply_markup=shipments_menu())
+        await asyncio.gather(
+            ack, _safe_edit(cb, "🚚 Отгрузки — выберите действие:", reply_markup=shipments_menu())
+        )
         return
 
     # Потребность по складам — если открывали
     if ("demand_method" in data) or ("demand_period" in data) or ("demand_view" in data):
         await state.update_data(step="ship_root")
-        await _safe_edit(cb, "🚚 Отгрузки — выберите действие:", reply_markup=shipments_menu())
+        await asyncio.gather(
+            ack, _safe_edit(cb, "🚚 Отгрузки — выберите действие:", reply_markup=shipments_menu())
+        )
         return
 
     # Фолбэк — главное меню
     await state.update_data(step="home")
-    await _safe_edit(cb, "🏠 Главное меню — выберите раздел:", reply_markup=main_menu())
+    await asyncio.gather(
+        ack, _safe_edit(cb, "🏠 Главное меню — выберите раздел:", reply_markup=main_menu())
+    )
 
 
 __all__ = ["router"]
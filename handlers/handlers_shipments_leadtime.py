@@ -184,11 +184,11 @@ def _get_follow_status(wid: int) -> Tuple[bool, int]:
 
 def _lead_home_text() -> str:
     filled, total = get_progress()
-    pct = (filled / total * 100.0) if total else 0.0
+    pct = (filled * 100) // total if total else 0
     return (
         "⏰ <b>Сроки доставки</b>\n"
         f"Обновлено {_now()}\n\n"
-        f"Заполнено: <b>{filled}/{total}</b> складов ({pct:.0f}%)\n\n"
+        f"Заполнено: <b>{filled}/{total}</b> складов ({pct}%)\n\n"
         "Выберите действие:"
     )
 
@@ -223,11 +223,11 @@ async def lead_start(cb: CallbackQuery, state: FSMContext):
 
 def _lead_list_text() -> str:
     filled, total = get_progress()
-    pct = (filled / total * 100.0) if total else 0.0
+    pct = (filled * 100) // total if total else 0
     return (
         "✍️ <b>️Изменить сроки доставки — список складов</b>\n"
         f"Обновлено {_now()}\n\n"
-        f"Заполнено: <b>{filled}/{total}</b> складов ({pct:.0f}%)\n"
+        f"Заполнено: <b>{filled}/{total}</b> складов ({pct}%)\n"
         "• Для ускорения список использует кэш имён.\n"
         "• Нажмите «🔄 Обновить имена» (кнопка внизу), чтобы подтянуть новые/исправить плейсхолдеры.\n\n"
         "Выберите склад из списка:"
@@ -613,6 +613,10 @@ def _kb_with_nav(kind: str, page: int, pages: int) -> List[List[InlineKeyboardBu
     return rows
 
 
+# Одностраничный отчёт (и пустые ветки) — навигации нет, клавиатура одинакова для любого kind
+_SINGLE_PAGE_KB = InlineKeyboardMarkup(inline_keyboard=_kb_with_nav("sku", 0, 1))
+
+
 @router.callback_query(F.data.regexp(r"^lead:report:(warehouse|cluster|sku):\d+$"))
 async def lead_report(cb: CallbackQuery):
     await _ack(cb)
@@ -630,7 +634,7 @@ async def lead_report(cb: CallbackQuery):
                 cb,
                 text,
                 parse_mode="HTML",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=_kb_with_nav("warehouse", 0, 1)),
+                reply_markup=_SINGLE_PAGE_KB,
             )
             return
         slice_rows, _total, pages, page = _slice(rows, page, REPORT_PAGE_SIZE)
@@ -659,7 +663,7 @@ async def lead_report(cb: CallbackQuery):
                 cb,
                 text,
                 parse_mode="HTML",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=_kb_with_nav("cluster", 0, 1)),
+                reply_markup=_SINGLE_PAGE_KB,
             )
             return
         slice_rows, _total, pages, page = _slice(rows, page, REPORT_PAGE_SIZE)
@@ -686,7 +690,11 @@ async def lead_report(cb: CallbackQuery):
         "\n".join(f"🔹 {alias} — ∅={avg:.2f} дн" for _sku, alias, avg, _n in slice_rows)
         or "ℹ️ Нет данных по SKU."
     )
-    kb = InlineKeyboardMarkup(inline_keyboard=_kb_with_nav("sku", page, pages))
+    kb = (
+        _SINGLE_PAGE_KB
+        if pages == 1
+        else InlineKeyboardMarkup(inline_keyboard=_kb_with_nav("sku", page, pages))
+    )
     text = f"{title}\n⏱ Обновлено: {_now()}\n\n{body}"
     await _safe_edit(cb, text, parse_mode="HTML", reply_markup=kb)
 
@@ -2,12 +2,25 @@
 from __future__ import annotations
 
 import os
+import re
 import json
 import math
+import time
 import asyncio
+import functools
+import tempfile
+import threading
 import datetime as _dt
+from array import array
 from typing import Dict, Any, List, Tuple, Optional
 
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # опциональная зависимость — фолбэк на stdlib json
+    orjson = None
+
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
@@ -70,6 +83,31 @@ except Exception:
         return {}
 
 
+# Один запрос статуса на всех одновременных читателей + короткий TTL результата
+_INGEST_STATUS_TTL_SEC = 5.0
+_INGEST_STATUS: Tuple[float, "asyncio.Future[dict]"] | None = None
+
+
+async def _ingest_status_shared() -> dict:
+    global _INGEST_STATUS
+    now = time.monotonic()
+    cur = _INGEST_STATUS
+    if cur is not None and cur[1].done():
+        ts, fut = cur
+        if fut.cancelled() or fut.exception() is not None or now - ts > _INGEST_STATUS_TTL_SEC:
+            cur = None
+    if cur is None:
+        fut = asyncio.ensure_future(ingest_status())
+        _INGEST_STATUS = (now, fut)
+    else:
+        fut = cur[1]
+    try:
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return dict(await asyncio.shield(fut) or {})
+    except Exception:
+        return {}
+
+
 # Алиасы SKU
 try:
     from modules_sales.sales_facts_store import get_alias_for_sku  # type: ignore
@@ -91,6 +129,24 @@ except Exception:
             return f"wh:{wid}"
 
 
+# Кэш имён складов (get_warehouse_title читает кэш-файлы на каждый вызов).
+# Плейсхолдеры «wh:<id>» не кэшируем — имя появится после обновления справочника.
+_WH_TITLE_CACHE: Dict[int, str] = {}
+_WH_TITLE_CACHE_MAX = 1024
+
+
+def _wh_title_cached(wid: int) -> str:
+    title = _WH_TITLE_CACHE.get(wid)
+    if title is not None:
+        return title
+    title = _wh_title(wid)
+    if title and title != f"wh:{wid}":
+        if len(_WH_TITLE_CACHE) >= _WH_TITLE_CACHE_MAX:
+            _WH_TITLE_CACHE.pop(next(iter(_WH_TITLE_CACHE)))
+        _WH_TITLE_CACHE[wid] = title
+    return title
+
+
 router = Router(name="leadtime_stats")
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -103,29 +159,56 @@ os.makedirs(os.path.dirname(_PREFS_PATH), exist_ok=True)
 PERIOD_CHOICES = (90, 180, 360)
 SKU_REPORT_PAGE_SIZE = int(os.getenv("LTS_SKU_PAGE_SIZE", "30"))
 
+# lts:sku:<ctx>:<page>, ctx = all | wh:<id> | cl:<id>
+_SKU_PAG_RE = re.compile(r"^lts:sku:(?P<ctx>all|wh:\d+|cl:\d+):(?P<page>\d+)$")
+
+# TTL локальных кэшей отчёта (имена кластеров, итоги по SKU)
+_STATS_CACHE_TTL_SEC = 60.0
+
 
 def _now() -> str:
-    return _dt.datetime.now().strftime("%d.%m.%Y %H:%M")
+    # фиксированный формат "%d.%m.%Y %H:%M" без разбора шаблона strftime
+    t = _dt.datetime.now()
+    return f"{t.day:02d}.{t.month:02d}.{t.year:04d} {t.hour:02d}:{t.minute:02d}"
 
 
-# We need sync version of _facade_get_stat_period or handle it async in _read_prefs?
-# _read_prefs is sync.
-# _facade_get_stat_period is async now.
-# However, _read_prefs just needs a default.
-# I'll use hardcoded default here to avoid making _read_prefs async which might complicate things
-# or rely on json read.
+# Default period is hardcoded: the prefs file is parsed in _read_prefs_sync (also run
+# via asyncio.to_thread), where the async _facade_get_stat_period is not available.
 DEFAULT_PERIOD = 180
 
-def _read_prefs() -> Dict[str, Any]:
+# Кэш распарсенного prefs-файла: (st_mtime_ns, dict); перечитываем только при смене mtime
+_PREFS_CACHE: Tuple[int, Dict[str, Any]] | None = None
+# Счётчик записей prefs (по нему фоновый автосбор понимает, что настройки поменялись)
+_PREFS_EPOCH = 0
+# Запись prefs идёт в пуле потоков: read-modify-write и глобалы — строго по одному писателю
+_PREFS_WRITE_LOCK = threading.Lock()
+
+
+def _prefs_mtime() -> int:
     try:
-        if os.path.exists(_PREFS_PATH):
-            with open(_PREFS_PATH, "r", encoding="utf-8") as f:
-                d = json.load(f) or {}
-        else:
+        return os.stat(_PREFS_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _load_prefs_raw() -> Dict[str, Any]:
+    global _PREFS_CACHE
+    mtime = _prefs_mtime()
+    if _PREFS_CACHE is not None and _PREFS_CACHE[0] == mtime:
+        return _PREFS_CACHE[1]
+    d: Dict[str, Any] = {}
+    if mtime:
+        try:
+            with open(_PREFS_PATH, "rb") as f:
+                raw = f.read()
+            d = (orjson.loads(raw) if orjson is not None else json.loads(raw)) or {}
+        except Exception:
             d = {}
-    except Exception:
-        d = {}
+    _PREFS_CACHE = (mtime, d)
+    return d
+
 
+def _prefs_from_raw(d: Dict[str, Any]) -> Dict[str, Any]:
     period = int(d.get("period", DEFAULT_PERIOD))
     if period not in PERIOD_CHOICES:
         period = DEFAULT_PERIOD
@@ -142,29 +225,73 @@ def _read_prefs() -> Dict[str, Any]:
     }
 
 
-def _write_prefs(
+def _read_prefs_sync() -> Dict[str, Any]:
+    return _prefs_from_raw(_load_prefs_raw())
+
+
+async def _read_prefs() -> Dict[str, Any]:
+    # попадание в кэш — без похода в пул потоков; промах — чтение файла вне event loop
+    cached = _PREFS_CACHE
+    if cached is not None and cached[0] == _prefs_mtime():
+        return _prefs_from_raw(cached[1])
+    return await asyncio.to_thread(_read_prefs_sync)
+
+
+def _write_prefs_sync(
     period: int | None = None,
     allocate_by_qty: bool | None = None,
     autotrack_enabled: bool | None = None,
     autotrack_interval_min: int | None = None,
-) -> None:
-    cur = _read_prefs()
-    if period is not None and period in PERIOD_CHOICES:
-        cur["period"] = int(period)
-    if allocate_by_qty is not None:
-        cur["allocate_by_qty"] = bool(allocate_by_qty)
-    if autotrack_enabled is not None:
-        cur["autotrack_enabled"] = bool(autotrack_enabled)
-        os.environ["LEAD_AUTOTRACK_ENABLED"] = "1" if cur["autotrack_enabled"] else "0"
-    if autotrack_interval_min is not None and autotrack_interval_min > 0:
-        cur["autotrack_interval_min"] = int(autotrack_interval_min)
-        os.environ["LEAD_AUTOTRACK_INTERVAL_MIN"] = str(int(autotrack_interval_min))
-    try:
-        os.makedirs(os.path.dirname(_PREFS_PATH), exist_ok=True)
-        with open(_PREFS_PATH, "w", encoding="utf-8") as f:
-            json.dump(cur, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+) -> Dict[str, Any]:
+    global _PREFS_CACHE, _PREFS_EPOCH
+    with _PREFS_WRITE_LOCK:
+        cur = _read_prefs_sync()
+        if period is not None and period in PERIOD_CHOICES:
+            cur["period"] = int(period)
+        if allocate_by_qty is not None:
+            cur["allocate_by_qty"] = bool(allocate_by_qty)
+        if autotrack_enabled is not None:
+            cur["autotrack_enabled"] = bool(autotrack_enabled)
+            os.environ["LEAD_AUTOTRACK_ENABLED"] = "1" if cur["autotrack_enabled"] else "0"
+        if autotrack_interval_min is not None and autotrack_interval_min > 0:
+            cur["autotrack_interval_min"] = int(autotrack_interval_min)
+            os.environ["LEAD_AUTOTRACK_INTERVAL_MIN"] = str(int(autotrack_interval_min))
+        tmp = None
+        try:
+            prefs_dir = os.path.dirname(_PREFS_PATH)
+            os.makedirs(prefs_dir, exist_ok=True)
+            if orjson is not None:
+                payload = orjson.dumps(cur, option=orjson.OPT_INDENT_2)
+            else:
+                payload = json.dumps(cur, ensure_ascii=False, indent=2).encode("utf-8")
+            # атомарно: пишем в уникальный временный файл рядом и подменяем —
+            # читатель не увидит «полфайла»
+            fd, tmp = tempfile.mkstemp(dir=prefs_dir, prefix=".lead_stats_prefs.", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, _PREFS_PATH)
+            tmp = None
+            _PREFS_CACHE = (os.stat(_PREFS_PATH).st_mtime_ns, dict(cur))
+        except Exception:
+            _PREFS_CACHE = None
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        _PREFS_EPOCH += 1
+        return cur
+
+
+async def _write_prefs(
+    period: int | None = None,
+    allocate_by_qty: bool | None = None,
+    autotrack_enabled: bool | None = None,
+    autotrack_interval_min: int | None = None,
+) -> Dict[str, Any]:
+    return await asyncio.to_thread(
+        _write_prefs_sync, period, allocate_by_qty, autotrack_enabled, autotrack_interval_min
+    )
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -173,36 +300,46 @@ def _write_prefs(
 _AUTO_TASK: Optional[asyncio.Task] = None
 
 
-def _autotrack_enabled() -> bool:
+def _autotrack_enabled(prefs: Dict[str, Any]) -> bool:
     if os.getenv("LEAD_AUTOTRACK_ENABLED", "1") == "0":
         return False
+    return bool(prefs.get("autotrack_enabled", True))
+
+
+def _autotrack_settings(prefs: Dict[str, Any]) -> Tuple[bool, int, int]:
+    """(enabled, interval_min, pages) из env с фолбэком на prefs."""
+    try:
+        env_interval = os.getenv("LEAD_AUTOTRACK_INTERVAL_MIN")
+        if env_interval is None:
+            env_interval = str(prefs.get("autotrack_interval_min", 30))
+        interval_min = int(env_interval)
+    except Exception:
+        interval_min = 30
     try:
-        return bool(_read_prefs().get("autotrack_enabled", True))
+        pages = int(os.getenv("LEAD_INGEST_PAGES", "3"))
     except Exception:
-        return True
+        pages = 3
+    return _autotrack_enabled(prefs), interval_min, pages
 
 
 async def _autotrack_loop():
+    # настройки перечитываем только если prefs менялись (эпоха записи или mtime файла)
+    last_key: Tuple[int, int] | None = None
+    enabled, interval_min, pages = True, 30, 3
     while True:
-        try:
-            interval_min = int(
-                os.getenv(
-                    "LEAD_AUTOTRACK_INTERVAL_MIN",
-                    str(_read_prefs().get("autotrack_interval_min", 30)),
-                )
-            )
-        except Exception:
-            interval_min = 30
-
-        if not _autotrack_enabled():
+        key = (_PREFS_EPOCH, _prefs_mtime())
+        if key != last_key:
+            last_key = key
+            try:
+                prefs = await _read_prefs()
+            except Exception:
+                prefs = {}
+            enabled, interval_min, pages = _autotrack_settings(prefs)
+
+        if not enabled:
             await asyncio.sleep(max(60, interval_min * 60))
             continue
 
-        try:
-            pages = int(os.getenv("LEAD_INGEST_PAGES", "3"))
-        except Exception:
-            pages = 3
-
         try:
             from modules_shipments.shipments_leadtime_stats_data import ingest_tick  # type: ignore
 
@@ -231,9 +368,25 @@ def _fmt_metrics(m: Dict[str, float]) -> str:
     return f"avg {m.get('avg', 0):.2f} дн"
 
 
-def _fmt_line_sku(sku: int, alias: str, m: Dict[str, float]) -> str:
-    n = int((m or {}).get("n", 0) or 0)
-    return f"🔹 {alias or sku}: {m.get('avg', 0.0):.2f} дн" + (f" (n={n})" if n else "")
+class _SkuRows:
+    """Строки отчёта по SKU в виде параллельных массивов (SoA) вместо кортежей со словарями."""
+
+    __slots__ = ("skus", "aliases", "avgs", "ns")
+
+    def __init__(self, rows: List[Tuple[int, str, Dict[str, float]]] | None = None) -> None:
+        self.skus: List[int] = []
+        self.aliases: List[str] = []
+        self.avgs = array("d")
+        self.ns = array("q")
+        for sku, alias, m in rows or []:
+            m = m or {}
+            self.skus.append(int(sku))
+            self.aliases.append(alias)
+            self.avgs.append(float(m.get("avg", 0.0) or 0.0))
+            self.ns.append(int(m.get("n", 0) or 0))
+
+    def __len__(self) -> int:
+        return len(self.skus)
 
 
 def _label_cluster(name: str, m: Dict[str, float]) -> str:
@@ -244,28 +397,74 @@ def _label_wh(name: str, m: Dict[str, float]) -> str:
     return f"{name} — ∅={m.get('avg', 0.0):.2f} дн"
 
 
-def _weighted_total(rows: List[Tuple[int, str, Dict[str, float]]]) -> Tuple[float, int, int]:
-    if not rows:
+# С какого числа строк итоги считаем через numpy (на малых списках накладные расходы выше выигрыша)
+_NUMPY_TOTALS_MIN_ROWS = 256
+
+
+def _weighted_total(rows: _SkuRows) -> Tuple[float, int, int]:
+    cnt = len(rows)
+    if not cnt:
         return 0.0, 0, 0
-    total_n, total_sum = 0, 0.0
-    for _, _, m in rows:
-        n = int(m.get("n", 0) or 0)
-        total_n += n
-        total_sum += float(m.get("avg", 0.0)) * n
-    return ((total_sum / total_n) if total_n else 0.0), len(rows), total_n
+    if cnt >= _NUMPY_TOTALS_MIN_ROWS:
+        # массивы array('q'/'d') отдаются в numpy без копирования
+        ns = np.frombuffer(rows.ns, dtype=np.int64)
+        avgs = np.frombuffer(rows.avgs, dtype=np.float64)
+        total_n = int(ns.sum())
+        total_sum = float(np.dot(avgs, ns))
+    else:
+        total_n = sum(rows.ns)
+        total_sum = sum(a * n for a, n in zip(rows.avgs, rows.ns))
+    return ((total_sum / total_n) if total_n else 0.0), cnt, total_n
+
+
+# Итоги не зависят от страницы: (ctx, period) -> (monotonic_ts, totals)
+_TOTALS_CACHE: Dict[Tuple[str, int], Tuple[float, Tuple[float, int, int]]] = {}
+
+
+def _cached_totals(
+    ctx: str, period: int, raw: List[Tuple[int, str, Dict[str, float]]]
+) -> Tuple[float, int, int]:
+    now = time.monotonic()
+    key = (ctx, int(period))
+    hit = _TOTALS_CACHE.get(key)
+    if hit is not None and now - hit[0] <= _STATS_CACHE_TTL_SEC:
+        return hit[1]
+    totals = _weighted_total(_SkuRows(raw))
+    _TOTALS_CACHE[key] = (now, totals)
+    return totals
 
 
 # Имя кластера для заголовка по id (берём из статистики текущего периода)
+# period -> (monotonic_ts, {cid: name}); TTL, чтобы переименования кластеров всё же подтягивались
+_CLUSTER_NAME_CACHE: Dict[int, Tuple[float, Dict[int, str]]] = {}
 
 
 async def _cluster_name_from_stats(period: int, cid: int) -> str:
+    now = time.monotonic()
+    hit = _CLUSTER_NAME_CACHE.get(int(period))
+    if hit is None or now - hit[0] > _STATS_CACHE_TTL_SEC:
+        try:
+            names = {
+                int(_cid): str(cname)
+                for _cid, cname, _m in await get_lead_stats_by_cluster(period) or []
+            }
+        except Exception:
+            return str(cid)
+        hit = (now, names)
+        _CLUSTER_NAME_CACHE[int(period)] = hit
+    return hit[1].get(int(cid), str(cid))
+
+
+async def _invalidate_all() -> None:
+    """Сбросить кэш статистики фасада и локальные кэши отчёта."""
+    _CLUSTER_NAME_CACHE.clear()
+    _TOTALS_CACHE.clear()
+    _BODY_CACHE.clear()
+    _WH_TITLE_CACHE.clear()
     try:
-        for _cid, cname, _m in await get_lead_stats_by_cluster(period) or []:
-            if int(_cid) == int(cid):
-                return str(cname)
+        await invalidate_stats_cache()
     except Exception:
         pass
-    return str(cid)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -273,18 +472,27 @@ async def _cluster_name_from_stats(period: int, cid: int) -> str:
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _menu_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="🔢 По SKU", callback_data="lts:view:sku")],
-            [InlineKeyboardButton(text="🏢 По кластерам", callback_data="lts:view:cluster")],
-            [InlineKeyboardButton(text="🏭 По складам", callback_data="lts:view:warehouse")],
-            [InlineKeyboardButton(text="⚙️ Настройки", callback_data="lts:settings")],
-            [InlineKeyboardButton(text="📦 Информация по заявкам", callback_data="lts:info")],
-            [InlineKeyboardButton(text="◀️ К срокам доставки", callback_data="lead:start")],
-            [InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")],
-        ]
-    )
+# Статичные строки/клавиатуры — собираются один раз при импорте (не зависят от данных)
+_ROW_HOME = [InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")]
+_ROW_TO_SECTION = [InlineKeyboardButton(text="◀️ К разделу", callback_data="leadtime:stats")]
+_ROW_TO_WAREHOUSES = [InlineKeyboardButton(text="◀️ К складам", callback_data="lts:view:warehouse")]
+_ROW_TO_CLUSTERS = [InlineKeyboardButton(text="◀️ К кластерам", callback_data="lts:view:cluster")]
+_ROW_TO_STATS = [InlineKeyboardButton(text="◀️ К статистике", callback_data="leadtime:stats")]
+_ROW_TO_LEAD = [InlineKeyboardButton(text="◀️ К срокам доставки", callback_data="lead:start")]
+
+_MENU_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="🔢 По SKU", callback_data="lts:view:sku")],
+        [InlineKeyboardButton(text="🏢 По кластерам", callback_data="lts:view:cluster")],
+        [InlineKeyboardButton(text="🏭 По складам", callback_data="lts:view:warehouse")],
+        [InlineKeyboardButton(text="⚙️ Настройки", callback_data="lts:settings")],
+        [InlineKeyboardButton(text="📦 Информация по заявкам", callback_data="lts:info")],
+        _ROW_TO_LEAD,
+        _ROW_HOME,
+    ]
+)
+
+_INFO_KB = InlineKeyboardMarkup(inline_keyboard=[_ROW_TO_SECTION, _ROW_HOME])
 
 
 async def _safe_edit(cb: CallbackQuery, text: str, **kwargs):
@@ -311,13 +519,14 @@ async def _ack(cb: CallbackQuery) -> None:
 
 @router.callback_query(F.data == "leadtime:stats")
 async def lts_home(cb: CallbackQuery):
-    await _ack(cb)
+    ack_task = asyncio.create_task(_ack(cb))  # ответ на callback — параллельно с выборкой
     _ensure_autotrack_started()
-    prefs = _read_prefs()
+    prefs = await _read_prefs()
     try:
         summary = await get_lead_stats_summary(prefs["period"])
     except Exception:
         summary = {}
+    await ack_task
     text = (
         "📄 <b>Статистика сроков доставки</b>\n"
         f"⏱ Обновлено: {_now()}\n\n"
@@ -326,7 +535,7 @@ async def lts_home(cb: CallbackQuery):
             'учитывать вес партии' if prefs['allocate_by_qty'] else 'не учитывать вес партии'}</b>\n\n"
         f"📊 ИТОГО по сети — {_fmt_metrics(summary)}"
     )
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_menu_kb())
+    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_MENU_KB)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -336,10 +545,11 @@ async def lts_home(cb: CallbackQuery):
 
 @router.callback_query(F.data == "lts:info")
 async def lts_info(cb: CallbackQuery):
-    await _ack(cb)
+    ack_task = asyncio.create_task(_ack(cb))
     _ensure_autotrack_started()
-    st = await ingest_status() or {}
-    prefs = _read_prefs()
+    st = await _ingest_status_shared()
+    prefs = await _read_prefs()
+    await ack_task
     text = (
         "📦 <b>Информация по заявкам</b>\n"
         "Фаза: <b>после дроп-офф (ACCEPTED → ACCEPTANCE_AT_STORAGE_WAREHOUSE → REPORTS_CONFIRMATION_AWAITING → COMPLETED)</b>\n\n"
@@ -353,13 +563,7 @@ async def lts_info(cb: CallbackQuery):
         f"🕓 Интервал опроса (env): <b>{int(prefs['autotrack_interval_min'])} мин</b>\n"
         f"🔘 Автосбор: <b>{'включён' if prefs['autotrack_enabled'] else 'выключен'}</b>"
     )
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="◀️ К разделу", callback_data="leadtime:stats")],
-            [InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")],
-        ]
-    )
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=kb)
+    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_INFO_KB)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -369,9 +573,10 @@ async def lts_info(cb: CallbackQuery):
 
 @router.callback_query(F.data == "lts:view:warehouse")
 async def lts_view_wh(cb: CallbackQuery):
-    await _ack(cb)
-    prefs = _read_prefs()
+    ack_task = asyncio.create_task(_ack(cb))
+    prefs = await _read_prefs()
     rows = await get_lead_stats_by_warehouse(prefs["period"])
+    await ack_task
     header = (
         "📄 <b>Сроки доставки — по складам</b>\n"
         f"⏱ Обновлено: {_now()}\n"
@@ -383,13 +588,13 @@ async def lts_view_wh(cb: CallbackQuery):
             cb,
             header + "ℹ️ Нет событий за выбранный период.",
             parse_mode="HTML",
-            reply_markup=_menu_kb(),
+            reply_markup=_MENU_KB,
         )
         return
     # ⚙️ ВАЖНО: всегда используем человеко‑читаемое имя склада
     kb = []
     for wid, _name_from_stats, m in rows:
-        title = _wh_title(int(wid)) or _name_from_stats or f"wh:{int(wid)}"
+        title = _wh_title_cached(int(wid)) or _name_from_stats or f"wh:{int(wid)}"
         kb.append(
             [
                 InlineKeyboardButton(
@@ -397,7 +602,7 @@ async def lts_view_wh(cb: CallbackQuery):
                 )
             ]
         )
-    kb.append([InlineKeyboardButton(text="◀️ К разделу", callback_data="leadtime:stats")])
+    kb.append(_ROW_TO_SECTION)
     await _safe_edit(
         cb, header, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb)
     )
@@ -405,9 +610,10 @@ async def lts_view_wh(cb: CallbackQuery):
 
 @router.callback_query(F.data == "lts:view:cluster")
 async def lts_view_cluster(cb: CallbackQuery):
-    await _ack(cb)
-    prefs = _read_prefs()
+    ack_task = asyncio.create_task(_ack(cb))
+    prefs = await _read_prefs()
     rows = await get_lead_stats_by_cluster(prefs["period"])
+    await ack_task
     header = (
         "📄 <b>Сроки доставки — по кластерам</b>\n"
         f"⏱ Обновлено: {_now()}\n"
@@ -419,7 +625,7 @@ async def lts_view_cluster(cb: CallbackQuery):
             cb,
             header + "ℹ️ Нет событий за выбранный период.",
             parse_mode="HTML",
-            reply_markup=_menu_kb(),
+            reply_markup=_MENU_KB,
         )
         return
     kb = [
@@ -430,7 +636,7 @@ async def lts_view_cluster(cb: CallbackQuery):
         ]
         for cid, name, m in rows
     ]
-    kb.append([InlineKeyboardButton(text="◀️ К разделу", callback_data="leadtime:stats")])
+    kb.append(_ROW_TO_SECTION)
     await _safe_edit(
         cb, header, parse_mode="HTML", reply_markup=InlineKeyboardMarkup(inline_keyboard=kb)
     )
@@ -451,20 +657,19 @@ def _sku_report_header(title: str, prefs: Dict[str, Any]) -> str:
     )
 
 
-def _sku_report_lines(
-    rows: List[Tuple[int, str, Dict[str, float]]], page: int, page_size: int
-) -> Tuple[str, int, Tuple[float, int, int]]:
-    total = len(rows)
-    if total == 0:
-        return "ℹ️ Нет событий/поставок по SKU за выбранный период.", 0, (0.0, 0, 0)
-    pages = max(1, math.ceil(total / page_size))
-    page = max(0, min(page, pages - 1))
-    start, end = page * page_size, min(total, (page + 1) * page_size)
-    body = "\n".join(_fmt_line_sku(int(sku), alias, m) for sku, alias, m in rows[start:end])
-    totals = _weighted_total(rows)
-    return body, pages, totals
+def _sku_report_lines(rows: _SkuRows) -> str:
+    cnt = len(rows)
+    if not cnt:
+        return "ℹ️ Нет событий/поставок по SKU за выбранный период."
+    skus, aliases, avgs, ns = rows.skus, rows.aliases, rows.avgs, rows.ns
+    parts: List[str] = [""] * cnt
+    for i in range(cnt):
+        n = ns[i]
+        parts[i] = f"🔹 {aliases[i] or skus[i]}: {avgs[i]:.2f} дн" + (f" (n={n})" if n else "")
+    return "\n".join(parts)
 
 
+@functools.lru_cache(maxsize=128)
 def _sku_report_kb(context: str, page: int, pages: int) -> InlineKeyboardMarkup:
     rows: List[List[InlineKeyboardButton]] = []
     nav: List[InlineKeyboardButton] = []
@@ -478,55 +683,115 @@ def _sku_report_kb(context: str, page: int, pages: int) -> InlineKeyboardMarkup:
     if nav:
         rows.append(nav)
     if context.startswith("wh:"):
-        rows.append([InlineKeyboardButton(text="◀️ К складам",                                              callback_data="lts:view:warehouse")])
+        rows.append(_ROW_TO_WAREHOUSES)
     elif context.startswith("cl:"):
-        rows.append([InlineKeyboardButton(text="◀️ К кластерам",                                              callback_data="lts:view:cluster")])
+        rows.append(_ROW_TO_CLUSTERS)
     else:
-        rows.append([InlineKeyboardButton(text="◀️ К разделу", callback_data="leadtime:stats")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
+        rows.append(_ROW_TO_SECTION)
+    rows.append(_ROW_HOME)
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-async def _fetch_sku_rows(context: str, period: int) -> List[Tuple[int, str, Dict[str, float]]]:
+async def _fetch_sku_rows_raw(
+    context: str, period: int
+) -> List[Tuple[int, str, Dict[str, float]]]:
     if context == "all":
         return await get_lead_stats_by_sku(period)
     if context.startswith("wh:"):
-        wid = int(context.split(":")[1])
+        wid = int(context[3:])  # "wh:<id>" | "cl:<id>"
         return await get_lead_stats_sku_for_warehouse(wid, period)
     if context.startswith("cl:"):
-        cid = int(context.split(":")[1])
+        cid = int(context[3:])
         return await get_lead_stats_sku_for_cluster(cid, period)
     return []
 
 
+async def _fetch_sku_page(
+    context: str, period: int, page: int, page_size: int
+) -> Tuple[_SkuRows, int, int, Tuple[float, int, int]]:
+    """
+    Строки только запрошенной страницы + (pages, page, totals).
+    Полный список живёт лишь до нарезки; итоги берутся из кэша по (context, period).
+    """
+    raw = await _fetch_sku_rows_raw(context, period) or []
+    total = len(raw)
+    pages = max(1, math.ceil(total / page_size))
+    page = max(0, min(page, pages - 1))
+    totals = _cached_totals(context, period, raw)
+    start, end = page * page_size, min(total, (page + 1) * page_size)
+    return _SkuRows(raw[start:end]), pages, page, totals
+
+
+# Готовое тело страницы: (ctx, period, page) -> (monotonic_ts, body, pages, page, totals)
+_BODY_CACHE: Dict[
+    Tuple[str, int, int], Tuple[float, str, int, int, Tuple[float, int, int]]
+] = {}
+_BODY_CACHE_MAX = 256
+
+
+async def _render_sku_page(
+    context: str, period: int, page: int
+) -> Tuple[str, int, int, Tuple[float, int, int]]:
+    """Тело страницы отчёта по SKU (+ pages, page, totals); повторные листания — из кэша."""
+    now = time.monotonic()
+    key = (context, int(period), int(page))
+    hit = _BODY_CACHE.get(key)
+    if hit is not None and now - hit[0] <= _STATS_CACHE_TTL_SEC:
+        return hit[1], hit[2], hit[3], hit[4]
+    rows, pages, page, totals = await _fetch_sku_page(context, period, page, SKU_REPORT_PAGE_SIZE)
+    body = _sku_report_lines(rows)
+    if len(_BODY_CACHE) >= _BODY_CACHE_MAX:
+        _BODY_CACHE.pop(next(iter(_BODY_CACHE)))
+    _BODY_CACHE[key] = (now, body, pages, page, totals)
+    return body, pages, page, totals
+
+
+# Ссылки на фоновые задачи предзагрузки (иначе их может собрать GC до завершения)
+_PREFETCH_TASKS: set[asyncio.Task] = set()
+
+
+def _prefetch_next_page(context: str, period: int, page: int, pages: int) -> None:
+    """Пока пользователь читает страницу page — прогреть в _BODY_CACHE следующую."""
+    nxt = page + 1
+    if nxt >= pages:
+        return
+    hit = _BODY_CACHE.get((context, int(period), nxt))
+    if hit is not None and time.monotonic() - hit[0] <= _STATS_CACHE_TTL_SEC:
+        return
+    task = asyncio.create_task(_render_sku_page(context, period, nxt))
+    _PREFETCH_TASKS.add(task)
+    task.add_done_callback(_PREFETCH_TASKS.discard)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
 @router.callback_query(F.data == "lts:view:sku")
 async def lts_view_sku(cb: CallbackQuery):
-    await _ack(cb)
-    prefs = _read_prefs()
-    rows = await _fetch_sku_rows("all", prefs["period"])
+    ack_task = asyncio.create_task(_ack(cb))
+    prefs = await _read_prefs()
+    body, pages, _page, totals = await _render_sku_page("all", prefs["period"], 0)
+    await ack_task
     header = _sku_report_header("📄 Показатели сроков доставки — Σ∅/SKU", prefs)
-    body, pages, totals = _sku_report_lines(rows, page=0, page_size=SKU_REPORT_PAGE_SIZE)
     total_avg, sku_count, _total_n = totals
     text = f"{header}{body}\n\n📊 <b>ИТОГО</b> — ∅={total_avg:.2f} дн • SKU: {sku_count}"
     await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_sku_report_kb("all", 0, pages))
+    _prefetch_next_page("all", prefs["period"], 0, pages)
 
 
-@router.callback_query(F.data.regexp(r"^lts:sku:(?:all|wh:\d+|cl:\d+):\d+$"))
-async def lts_sku_report_paginated(cb: CallbackQuery):
-    await _ack(cb)
-    parts = cb.data.split(":")
-    page = int(parts[-1])
-    ctx = ":".join(parts[2:-1])  # 'all' | 'wh:123' | 'cl:456'
+@router.callback_query(F.data.regexp(_SKU_PAG_RE).as_("match"))
+async def lts_sku_report_paginated(cb: CallbackQuery, match: re.Match[str]):
+    ack_task = asyncio.create_task(_ack(cb))
+    page = int(match.group("page"))
+    ctx = match.group("ctx")  # 'all' | 'wh:123' | 'cl:456'
 
-    prefs = _read_prefs()
-    rows = await _fetch_sku_rows(ctx, prefs["period"])
+    prefs = await _read_prefs()
+    body, pages, page, totals = await _render_sku_page(ctx, prefs["period"], page)
 
     # имена вместо чисел в заголовке
     if ctx.startswith("wh:"):
-        wid = int(ctx.split(":")[1])
-        title = f"📄 Показатели сроков доставки — склад {_wh_title(wid)}"
+        wid = int(ctx[3:])
+        title = f"📄 Показатели сроков доставки — склад {_wh_title_cached(wid)}"
     elif ctx.startswith("cl:"):
-        cid = int(ctx.split(":")[1])
+        cid = int(ctx[3:])
         title = f"📄 Показатели сроков доставки — кластер {
             await _cluster_name_from_stats(
                 prefs['period'], cid)}"
@@ -534,10 +799,11 @@ async def lts_sku_report_paginated(cb: CallbackQuery):
         title = "📄 Показатели сроков доставки — Σ∅/SKU"
 
     header = _sku_report_header(title, prefs)
-    body, pages, totals = _sku_report_lines(rows, page=page, page_size=SKU_REPORT_PAGE_SIZE)
     total_avg, sku_count, _total_n = totals
     text = f"{header}{body}\n\n📊 <b>ИТОГО</b> — ∅={total_avg:.2f} дн • SKU: {sku_count}"
+    await ack_task
     await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_sku_report_kb(ctx, page, pages))
+    _prefetch_next_page(ctx, prefs["period"], page, pages)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -545,8 +811,7 @@ async def lts_sku_report_paginated(cb: CallbackQuery):
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _settings_text() -> str:
-    p = _read_prefs()
+def _settings_text(p: Dict[str, Any]) -> str:
     return (
         "⚙️ <b>Настройки сроков доставки</b>\n\n"
         "Параметры применяются ко <u>всем пользователям</u>.\n\n"
@@ -557,66 +822,68 @@ def _settings_text() -> str:
     )
 
 
-def _settings_kb() -> InlineKeyboardMarkup:
-    p = _read_prefs()
+def _settings_kb(p: Dict[str, Any]) -> InlineKeyboardMarkup:
+    return _build_settings_kb(int(p["period"]), bool(p["allocate_by_qty"]))
+
+
+@functools.lru_cache(maxsize=8)
+def _build_settings_kb(period: int, allocate_by_qty: bool) -> InlineKeyboardMarkup:
     rows: List[List[InlineKeyboardButton]] = []
     rows.append(
         [
             InlineKeyboardButton(
-                text=("✓ 90 дн." if p["period"] == 90 else "90 дн."), callback_data="lts:per:90"
+                text=("✓ 90 дн." if period == 90 else "90 дн."), callback_data="lts:per:90"
             ),
             InlineKeyboardButton(
-                text=("✓ 180 дн." if p["period"] == 180 else "180 дн."), callback_data="lts:per:180"
+                text=("✓ 180 дн." if period == 180 else "180 дн."), callback_data="lts:per:180"
             ),
             InlineKeyboardButton(
-                text=("✓ 360 дн." if p["period"] == 360 else "360 дн."), callback_data="lts:per:360"
+                text=("✓ 360 дн." if period == 360 else "360 дн."), callback_data="lts:per:360"
             ),
         ]
     )
     rows.append(
         [
             InlineKeyboardButton(
-                text=("✓ Учитывать вес партии" if p["allocate_by_qty"] else "Учитывать вес партии"),
+                text=("✓ Учитывать вес партии" if allocate_by_qty else "Учитывать вес партии"),
                 callback_data="lts:alloc:on",
             ),
             InlineKeyboardButton(
                 text=(
                     "✓ Не учитывать вес партии"
-                    if not p["allocate_by_qty"]
+                    if not allocate_by_qty
                     else "Не учитывать вес партии"
                 ),
                 callback_data="lts:alloc:off",
             ),
         ]
     )
-    rows.append([InlineKeyboardButton(text="◀️ К статистике", callback_data="leadtime:stats")])
-    rows.append([InlineKeyboardButton(text="◀️ К срокам доставки", callback_data="lead:start")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
+    rows.append(_ROW_TO_STATS)
+    rows.append(_ROW_TO_LEAD)
+    rows.append(_ROW_HOME)
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 @router.callback_query(F.data == "lts:settings")
 async def lts_settings(cb: CallbackQuery):
     await _ack(cb)
-    await _safe_edit(cb, _settings_text(), parse_mode="HTML", reply_markup=_settings_kb())
+    p = await _read_prefs()
+    await _safe_edit(cb, _settings_text(p), parse_mode="HTML", reply_markup=_settings_kb(p))
 
 
 @router.callback_query(F.data.startswith("lts:per:"))
 async def lts_set_period(cb: CallbackQuery):
     await _ack(cb)
     try:
-        period = int(cb.data.split(":")[-1])
+        period = int(cb.data.rpartition(":")[2])
     except Exception:
         # _facade_get_stat_period is async
         period = await _facade_get_stat_period()
     if period not in PERIOD_CHOICES:
         period = await _facade_get_stat_period()
-    _write_prefs(period=period)
-    try:
-        await invalidate_stats_cache()
-    except Exception:
-        pass
-    await _safe_edit(cb, _settings_text(), parse_mode="HTML", reply_markup=_settings_kb())
+    p = await _write_prefs(period=period)
+    await _invalidate_all()
+    await _safe_edit(cb, _settings_text(p), parse_mode="HTML", reply_markup=_settings_kb(p))
 
 
 @router.callback_query(F.data.startswith("lts:alloc:"))
@@ -626,14 +893,18 @@ async def lts_set_alloc(cb: CallbackQuery):
 
     ok_note = "\n\n♻️ Применили новое правило распределения и обновили события."
     err_note = "\n\n⚠️ Не удалось применить новое правило (проверьте логи)."
+    p: Dict[str, Any] | None = None
     try:
         await set_lead_allocation_flag(bool(turn_on))
-        _write_prefs(allocate_by_qty=turn_on)
+        p = await _write_prefs(allocate_by_qty=turn_on)
+        await _invalidate_all()
         note = ok_note
     except Exception:
         note = err_note
 
-    await _safe_edit(cb, _settings_text() + note, parse_mode="HTML", reply_markup=_settings_kb())
+    if p is None:
+        p = await _read_prefs()
+    await _safe_edit(cb, _settings_text(p) + note, parse_mode="HTML", reply_markup=_settings_kb(p))
 
 
 __all__ = ["router"]
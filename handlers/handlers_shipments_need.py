@@ -2,9 +2,21 @@
 from __future__ import annotations
 
 import os
+import re
 import json
+import asyncio
+import atexit
+import time
+import functools
+import itertools
+import threading
 import datetime as _dt
-from typing import List, Optional, Tuple, Dict
+from typing import Any, List, Optional, Tuple, Dict
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # опциональная зависимость — фолбэк на stdlib json
+    orjson = None
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
@@ -41,7 +53,7 @@ except Exception:
 
 
 # единая точка выбора каталога отчётов
-from modules_common.paths import resolve_reports_dir
+from modules_common.paths import resolve_reports_dir, CACHE_SHIP, CACHE_COMMON
 
 router = Router(name="shipments_need")
 TG_MAX = 4096
@@ -56,8 +68,19 @@ DISPATCH_PREFS_PATH = os.path.join(
     MODULES_SHIP_DIR, "data", "cache", "common", "need_dispatch.json"
 )
 CLOSED_WH_PATH = os.path.join(MODULES_SHIP_DIR,                                  "data",                                  "cache",                                  "common",                                  "closed_warehouses.json")
-os.makedirs(os.path.dirname(DISPATCH_PREFS_PATH), exist_ok=True)
-os.makedirs(os.path.dirname(CLOSED_WH_PATH), exist_ok=True)
+
+# каталоги, уже созданные в этом процессе — makedirs не дёргаем на каждую запись
+_ENSURED_DIRS: set[str] = set()
+
+
+def _ensure_dir(path: str) -> None:
+    if path not in _ENSURED_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _ENSURED_DIRS.add(path)
+
+
+_ensure_dir(os.path.dirname(DISPATCH_PREFS_PATH))
+_ensure_dir(os.path.dirname(CLOSED_WH_PATH))
 
 # ─────────────────────────────────────────────────────────────────────────────
 # JSON utils
@@ -65,24 +88,146 @@ os.makedirs(os.path.dirname(CLOSED_WH_PATH), exist_ok=True)
 
 
 def _read_json(path: str) -> dict:
+    # без os.path.exists: отсутствующий файл и так даст FileNotFoundError
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return {}
+    if not raw:
+        return {}
     try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f) or {}
+        d = (orjson.loads(raw) if orjson is not None else json.loads(raw)) or {}
     except Exception:
-        pass
-    return {}
+        return {}
+    return d if isinstance(d, dict) else {}
 
 
 def _write_json(path: str, payload: dict) -> None:
     try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        _ensure_dir(os.path.dirname(path))
+        if orjson is not None:
+            data = orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        else:
+            data = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        # атомарно: пишем во временный файл и подменяем — читатель не увидит «полфайла»
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except FileNotFoundError:
+        # каталог удалили на ходу — следующая запись создаст его заново
+        _ENSURED_DIRS.discard(os.path.dirname(path))
     except Exception:
         pass
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Состояние раздела в памяти (S / дата отгрузки / закрытые склады)
+# Эти файлы пишет только этот модуль, поэтому источник истины — _STATE,
+# а диск — персистентность: читаем один раз при импорте, пишем в фоне.
+# ─────────────────────────────────────────────────────────────────────────────
+
+
+def _closed_from_disk() -> List[int]:
+    closed = _read_json(CLOSED_WH_PATH).get("closed") or []
+    out: List[int] = []
+    for x in closed:
+        # проверка типа вместо try/except на каждый элемент; мусор молча пропускаем
+        if isinstance(x, int):
+            out.append(x)
+        elif isinstance(x, str) and x.strip().lstrip("-").isdecimal():
+            out.append(int(x))
+    return out
+
+
+_STATE: Dict[str, Any] = {
+    "dispatch": _read_json(DISPATCH_PREFS_PATH),
+    "closed": set(_closed_from_disk()),  # каноническое множество, меняется точечно
+    "closed_frozen": None,  # снимок для чтения/ключей кэша, пересобирается лениво
+    "closed_rev": 0,  # ревизия: растёт при каждом изменении закрытых складов
+    "closed_updated_at": None,
+}
+_STATE["dispatch"].setdefault("days", 0)
+
+_PERSIST_LOCK = threading.Lock()
+
+# Отложенная запись: клики (листание календаря, отметки складов) только меняют _STATE,
+# фоновый писатель раз в _FLUSH_DELAY_SEC сбрасывает накопленное на диск одной записью.
+_FLUSH_DELAY_SEC = 0.25
+# kind -> номер последнего изменения; метка снимается только после успешной записи
+# и только если за время записи не было новых изменений (иначе запись повторится)
+_DIRTY: Dict[str, int] = {}
+_DIRTY_SEQ = itertools.count(1)
+_FLUSHER: Dict[str, Any] = {"task": None, "event": None}
+
+
+def _write_state_sync(kind: str) -> None:
+    # снимок берём под замком в момент записи: последняя запись всегда несёт актуальное состояние
+    with _PERSIST_LOCK:
+        if kind == "dispatch":
+            _write_json(DISPATCH_PREFS_PATH, dict(_STATE["dispatch"]))
+        else:
+            _write_json(
+                CLOSED_WH_PATH,
+                {"closed": sorted(_load_closed_wids()), "updated_at": _STATE["closed_updated_at"]},
+            )
+
+
+def _mark_clean(kind: str, seq: int) -> None:
+    if _DIRTY.get(kind) == seq:
+        del _DIRTY[kind]
+
+
+async def _flush_dirty() -> None:
+    for kind, seq in sorted(_DIRTY.items()):
+        await asyncio.to_thread(_write_state_sync, kind)
+        _mark_clean(kind, seq)
+
+
+async def _flusher(event: asyncio.Event) -> None:
+    while True:
+        await event.wait()
+        await asyncio.sleep(_FLUSH_DELAY_SEC)  # окно склейки серии кликов
+        event.clear()
+        try:
+            await _flush_dirty()
+        except Exception:
+            pass
+
+
+def _flush_all_sync() -> None:
+    for kind, seq in sorted(_DIRTY.items()):
+        _write_state_sync(kind)
+        _mark_clean(kind, seq)
+
+
+atexit.register(_flush_all_sync)
+
+
+def _persist(kind: str) -> None:
+    _DIRTY[kind] = next(_DIRTY_SEQ)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _flush_all_sync()
+        return
+    task = _FLUSHER["task"]
+    if task is None or task.done() or task.get_loop() is not loop:
+        _FLUSHER["event"] = asyncio.Event()
+        _FLUSHER["task"] = loop.create_task(_flusher(_FLUSHER["event"]))
+    _FLUSHER["event"].set()
+
+
+async def _ensure_closed_persisted() -> None:
+    # compute_need читает закрытые склады с диска — отложенную запись сбрасываем перед расчётом.
+    # Метка «closed» снимается только после записи, поэтому идущий в фоне сброс её не прячет.
+    seq = _DIRTY.get("closed")
+    if seq is not None:
+        await asyncio.to_thread(_write_state_sync, "closed")
+        _mark_clean("closed", seq)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Dispatch date (S) — хранение/визуал
 # ─────────────────────────────────────────────────────────────────────────────
@@ -91,9 +236,13 @@ def _write_json(path: str, payload: dict) -> None:
 def _load_dispatch() -> dict:
     """
     {"date":"YYYY-MM-DD","days":0,"view_year":YYYY,"view_month":M}
+    Возвращает живое состояние — только для чтения, менять через _save_dispatch.
     """
-    d = _read_json(DISPATCH_PREFS_PATH)
-    return d if isinstance(d, dict) else {}
+    return _STATE["dispatch"]
+
+
+def _current_S() -> int:
+    return int(_STATE["dispatch"].get("days") or 0)
 
 
 def _save_dispatch(
@@ -103,7 +252,8 @@ def _save_dispatch(
     view_year: Optional[int] = None,
     view_month: Optional[int] = None,
 ) -> dict:
-    payload = _load_dispatch()
+    payload = _STATE["dispatch"]
+    prev = (payload.get("date"), payload.get("days"))
     if date_iso is not None or "date" in payload:
         payload["date"] = date_iso  # допускаем None для сброса
     payload["days"] = max(0, int(days))
@@ -111,7 +261,10 @@ def _save_dispatch(
         payload["view_year"] = int(view_year)
     if view_month is not None:
         payload["view_month"] = int(view_month)
-    _write_json(DISPATCH_PREFS_PATH, payload)
+    _persist("dispatch")
+    # листание календаря (view_*) расчёт не меняет — кэш сбрасываем только при смене даты/S
+    if (payload.get("date"), payload.get("days")) != prev:
+        _cache_invalidate()
     return payload
 
 
@@ -139,24 +292,124 @@ def _roll_view_month(year: int, month: int, delta: int) -> Tuple[int, int]:
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _load_closed_wids() -> List[int]:
-    js = _read_json(CLOSED_WH_PATH)
-    closed = js.get("closed") or []
-    out: List[int] = []
-    for x in closed:
-        try:
-            out.append(int(x))
-        except Exception:
-            continue
-    return out
+def _load_closed_wids() -> frozenset[int]:
+    """
+    Закрытые склады из памяти: файл читается один раз при импорте, дальше
+    _STATE — единственный источник (запись на диск — через _persist).
+    Снимок frozenset живёт до следующего изменения и годится как ключ кэша.
+    """
+    snap = _STATE["closed_frozen"]
+    if snap is None:
+        snap = _STATE["closed_frozen"] = frozenset(_STATE["closed"])
+    return snap
+
+
+def _closed_changed() -> None:
+    _STATE["closed_rev"] += 1
+    _STATE["closed_frozen"] = None
+    _STATE["closed_updated_at"] = _dt.datetime.now().strftime("%Y-%m-%d %H:%M")
+    _persist("closed")
+    _cache_invalidate()
+
+
+def _toggle_closed_wid(wid: int) -> None:
+    closed = _STATE["closed"]
+    if wid in closed:
+        closed.discard(wid)
+    else:
+        closed.add(wid)
+    _closed_changed()
 
 
 def _save_closed_wids(closed: List[int]) -> None:
-    payload = {
-        "closed": sorted(set(int(x) for x in closed if isinstance(x, (int,)))),
-        "updated_at": _dt.datetime.now().strftime("%Y-%m-%d %H:%M"),
-    }
-    _write_json(CLOSED_WH_PATH, payload)
+    _STATE["closed"] = set(int(x) for x in closed if isinstance(x, (int,)))
+    _closed_changed()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Кэш расчёта (compute_need → format_need_text → страницы)
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Файлы-источники compute_need: любое изменение mtime — новый ключ кэша
+# (закрытые склады входят в ключ из _STATE)
+_STOCKS_CACHE_PATH = os.path.join(CACHE_SHIP, "stocks_cache_shipments.json")
+_NEED_SOURCE_PATHS: Tuple[str, ...] = (
+    _STOCKS_CACHE_PATH,
+    os.path.join(CACHE_SHIP, "plan30_cache.json"),
+    os.path.join(CACHE_SHIP, "leadtime_cache.json"),
+    os.path.join(CACHE_SHIP, "demand_warm_state.json"),
+    os.path.join(CACHE_COMMON, "clusters_cache.json"),
+)
+# часть данных compute_need тянет не из файлов — ограничиваем жизнь кэша по времени
+_NEED_CACHE_TTL_SEC = 60.0
+
+
+def _need_sig() -> tuple:
+    mtimes = []
+    for p in _NEED_SOURCE_PATHS:
+        try:
+            mtimes.append(os.stat(p).st_mtime_ns)
+        except OSError:
+            mtimes.append(0)
+    return (
+        int(time.monotonic() // _NEED_CACHE_TTL_SEC),
+        tuple(mtimes),
+        _STATE["closed_rev"],
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_compute(
+    scope: str, S: int, fk: Optional[str], fid: Optional[int], sig: tuple
+) -> dict:
+    if fk == "cluster" and fid is not None:
+        return compute_need(scope, dispatch_days=S, filter_cluster=fid)
+    if fk == "warehouse" and fid is not None:
+        return compute_need(scope, dispatch_days=S, filter_warehouse=fid)
+    return compute_need(scope, dispatch_days=S)
+
+
+# готовые страницы по ключу (scope, S, fk, fid, sig): dict, чтобы попадание проверялось
+# прямо в event loop — в поток уходим только за реальным расчётом
+_PAGES_CACHE: Dict[tuple, Tuple[str, ...]] = {}
+_PAGES_CACHE_MAX = 64
+
+
+def _need_pages_sync(key: tuple) -> Tuple[str, ...]:
+    hit = _PAGES_CACHE.get(key)
+    if hit is not None:
+        return hit
+    full_text = format_need_text(_cached_compute(*key))
+    pages = _paginate_only_if_needed_cached(full_text)
+    if len(_PAGES_CACHE) >= _PAGES_CACHE_MAX:
+        _PAGES_CACHE.pop(next(iter(_PAGES_CACHE)))
+    _PAGES_CACHE[key] = pages
+    return pages
+
+
+async def _need_pages(
+    scope: str, S: int, fk: Optional[str] = None, fid: Optional[int] = None
+) -> Tuple[str, ...]:
+    key = (scope, S, fk, fid, _need_sig())
+    hit = _PAGES_CACHE.get(key)
+    if hit is not None:
+        return hit
+    await _ensure_closed_persisted()
+    # compute_need — синхронный CPU+IO: не блокируем event loop остальным чатам
+    return await asyncio.to_thread(_need_pages_sync, key)
+
+
+async def _need_data(
+    scope: str, S: int, fk: Optional[str] = None, fid: Optional[int] = None
+) -> dict:
+    """compute_need через общий с текстом отчёта кэш: экспорт после просмотра не пересчитывает."""
+    await _ensure_closed_persisted()
+    return await asyncio.to_thread(_cached_compute, scope, S, fk, fid, _need_sig())
+
+
+def _cache_invalidate() -> None:
+    _cached_compute.cache_clear()
+    _PAGES_CACHE.clear()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -179,40 +432,87 @@ async def _safe_answer(cb: CallbackQuery, *args, **kwargs):
         pass
 
 
+def _tail_int(data: str, default: Optional[int] = None) -> Optional[int]:
+    """Число после последнего «:» в callback_data (без split и исключений)."""
+    tail = data.rpartition(":")[2]
+    return int(tail) if tail.isdecimal() else default
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Навигационная клавиатура отчёта (кнопки в столбик; перелистывание — СВЕРХУ)
 # ─────────────────────────────────────────────────────────────────────────────
 
 
+# Кнопки-стрелки: текст постоянный, callback_data повторяется между пользователями
+@functools.lru_cache(maxsize=256)
+def _back_btn(callback_data: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton(text="« Назад", callback_data=callback_data)
+
+
+@functools.lru_cache(maxsize=256)
+def _fwd_btn(callback_data: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton(text="Вперёд »", callback_data=callback_data)
+
+
+# Постоянные кнопки отчёта: собираем один раз, меняются только навигация и экспорт
+_BTN_VIEW_SKU = InlineKeyboardButton(text="🔢 По SKU", callback_data="need:view:sku")
+_BTN_DATE = InlineKeyboardButton(text="🗓 Дата отгрузки", callback_data="need:date")
+_BTN_CLOSED = InlineKeyboardButton(text="🚫 Закрытые склады", callback_data="need:closed:page:0")
+_BTN_HOME = InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")
+
+_ROOT_ROWS_HEAD: List[List[InlineKeyboardButton]] = [
+    [_BTN_VIEW_SKU],
+    [InlineKeyboardButton(text="🏢 По кластерам", callback_data="need:view:cluster")],
+    [InlineKeyboardButton(text="🏭 По складам", callback_data="need:view:warehouse")],
+    [_BTN_DATE],
+    [_BTN_CLOSED],
+]
+_ROOT_ROWS_TAIL: List[List[InlineKeyboardButton]] = [
+    [InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")],
+    [_BTN_HOME],
+]
+_ROW_BACK_CLUSTERS = [
+    InlineKeyboardButton(text="↩️ Кластеры", callback_data="need:clusters:page:0")
+]
+_ROW_BACK_WHS = [InlineKeyboardButton(text="↩️ Склады", callback_data="need:whs:page:0")]
+_FILTERED_ROWS_HEAD: List[List[InlineKeyboardButton]] = [
+    [_BTN_VIEW_SKU],
+    [_BTN_DATE],
+    [_BTN_CLOSED],
+]
+_FILTERED_ROWS_TAIL: List[List[InlineKeyboardButton]] = [[_BTN_HOME]]
+
+
+# одностраничный отчёт (частый случай) — клавиатура без навигации, готовая на каждый scope
+_KB_NEED_ROOT_SINGLE: Dict[str, InlineKeyboardMarkup] = {}
+
+
 def _kb_need_root(scope: str, *, page: int = 0, pages: int = 1) -> InlineKeyboardMarkup:
+    if pages <= 1:
+        kb = _KB_NEED_ROOT_SINGLE.get(scope)
+        if kb is not None:
+            return kb
     rows: List[List[InlineKeyboardButton]] = []
 
     if pages > 1:
         nav_row: List[InlineKeyboardButton] = []
         if page > 0:
-            nav_row.append(InlineKeyboardButton(text="« Назад", callback_data=f"need:page:{scope}:{
-                        page - 1}"))
+            nav_row.append(_back_btn(f"need:page:{scope}:{page - 1}"))
         if page < pages - 1:
-            nav_row.append(InlineKeyboardButton(text="Вперёд »", callback_data=f"need:page:{scope}:{
-                        page + 1}"))
+            nav_row.append(_fwd_btn(f"need:page:{scope}:{page + 1}"))
         rows.append(nav_row)
 
-    rows.append([InlineKeyboardButton(text="🔢 По SKU", callback_data="need:view:sku")])
-    rows.append([InlineKeyboardButton(text="🏢 По кластерам", callback_data="need:view:cluster")])
-    rows.append([InlineKeyboardButton(text="🏭 По складам", callback_data="need:view:warehouse")])
-    rows.append([InlineKeyboardButton(text="🗓 Дата отгрузки", callback_data="need:date")])
-    rows.append(
-        [InlineKeyboardButton(text="🚫 Закрытые склады", callback_data="need:closed:page:0")]
-    )
+    rows += _ROOT_ROWS_HEAD
     rows.append(
         [InlineKeyboardButton(text="📥 Экспорт в Excel", callback_data=f"need:export:{scope}")]
     )
-    rows.append([InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
-
+    rows += _ROOT_ROWS_TAIL
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+_KB_NEED_ROOT_SINGLE.update({sc: _kb_need_root(sc) for sc in ("sku", "cluster", "warehouse")})
+
+
 def _kb_need_filtered(
     scope: str, *, page: int, pages: int, filter_kind: str, filter_id: int
 ) -> InlineKeyboardMarkup:
@@ -226,32 +526,16 @@ def _kb_need_filtered(
         nav_row: List[InlineKeyboardButton] = []
         if page > 0:
             nav_row.append(
-                InlineKeyboardButton(
-                    text="« Назад",
-                    callback_data=f"need:page:{scope}:{filter_kind}:{filter_id}:{page - 1}",
-                )
+                _back_btn(f"need:page:{scope}:{filter_kind}:{filter_id}:{page - 1}")
             )
         if page < pages - 1:
             nav_row.append(
-                InlineKeyboardButton(
-                    text="Вперёд »",
-                    callback_data=f"need:page:{scope}:{filter_kind}:{filter_id}:{page + 1}",
-                )
+                _fwd_btn(f"need:page:{scope}:{filter_kind}:{filter_id}:{page + 1}")
             )
         rows.append(nav_row)
 
-    if filter_kind == "cluster":
-        rows.append(
-            [InlineKeyboardButton(text="↩️ Кластеры", callback_data="need:clusters:page:0")]
-        )
-    else:
-        rows.append([InlineKeyboardButton(text="↩️ Склады", callback_data="need:whs:page:0")])
-
-    rows.append([InlineKeyboardButton(text="🔢 По SKU", callback_data="need:view:sku")])
-    rows.append([InlineKeyboardButton(text="🗓 Дата отгрузки", callback_data="need:date")])
-    rows.append(
-        [InlineKeyboardButton(text="🚫 Закрытые склады", callback_data="need:closed:page:0")]
-    )
+    rows.append(_ROW_BACK_CLUSTERS if filter_kind == "cluster" else _ROW_BACK_WHS)
+    rows += _FILTERED_ROWS_HEAD
     rows.append(
         [
             InlineKeyboardButton(
@@ -260,7 +544,7 @@ def _kb_need_filtered(
             )
         ]
     )
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
+    rows += _FILTERED_ROWS_TAIL
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
@@ -269,35 +553,100 @@ def _kb_need_filtered(
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _clusters_pages(page_size: int = 10) -> List[List[int]]:
-    """
-    ⚙️ Фильтруем кластеры по наличию хотя бы одного склада с положительным спросом (ΣD/день > 0).
-    """
+# Производные от get_warehouses_map(): сортировка складов/кластеров и cid→имя.
+# Пересобираются один раз на версию справочника (mtime кэша остатков + TTL).
+_WM_CACHE: Dict[str, Any] = {"ver": None, "derived": None}
+_WM_PAGES_CACHE: Dict[tuple, List[List[int]]] = {}
+
+
+# Разрешённые склады (ΣD/день > 0) — тот же TTL, что и у справочника:
+# get_positive_demand_wids() не дёргаем на каждый рендер клавиатуры.
+_ALLOWED_CACHE: Dict[str, Any] = {"ts": 0.0, "val": None}
+
+
+def _allowed_wids() -> frozenset:
+    now = time.monotonic()
+    val = _ALLOWED_CACHE["val"]
+    if val is None or now - _ALLOWED_CACHE["ts"] >= _NEED_CACHE_TTL_SEC:
+        val = _ALLOWED_CACHE["val"] = frozenset(get_positive_demand_wids() or [])
+        _ALLOWED_CACHE["ts"] = now
+    return val
+
+
+def _wm_version() -> tuple:
+    try:
+        mtime = os.stat(_STOCKS_CACHE_PATH).st_mtime_ns
+    except OSError:
+        mtime = 0
+    return (mtime, int(time.monotonic() // _NEED_CACHE_TTL_SEC))
+
+
+def _get_wm_derived() -> Dict[str, Any]:
+    ver = _wm_version()
+    derived = _WM_CACHE["derived"]
+    if derived is not None and _WM_CACHE["ver"] == ver:
+        return derived
+
     wm = get_warehouses_map()
-    allowed = set(get_positive_demand_wids() or [])
-    seen: Dict[int, str] = {}
-    for wid, (_wname, cid, cname) in wm.items():
+    cid2name: Dict[int, str] = {}
+    wid2cid: Dict[int, int] = {}
+    for wid, (_wn, cid, cname) in wm.items():
         if not cid:
             continue
+        wid2cid[wid] = int(cid)
+        if cid not in cid2name:
+            cid2name[int(cid)] = cname or f"Кластер {cid}"
+    derived = {
+        "wm": wm,
+        "sorted_wids": sorted(wm.keys(), key=lambda w: (wm[w][2], wm[w][0], int(w))),
+        "cid2name": cid2name,
+        "cid_sorted": sorted(cid2name.keys(), key=lambda c: cid2name[c]),
+        "wid2cid": wid2cid,
+    }
+    # пустой справочник (остатки ещё не выгружены) не запоминаем — следующий
+    # рендер попробует снова, а не будет показывать пустое меню весь TTL
+    _WM_CACHE["ver"] = ver if wm else None
+    _WM_CACHE["derived"] = derived
+    _WM_PAGES_CACHE.clear()
+    return derived
+
+
+def _chunk_pages(ids: List[int], page_size: int) -> List[List[int]]:
+    return [ids[i : i + page_size] for i in range(0, len(ids), page_size)] or [[]]
+
+
+def _clusters_data(
+    page_size: int, allowed: frozenset
+) -> Tuple[List[List[int]], Dict[int, str]]:
+    """Страницы кластеров и cid→имя из одного прохода по справочнику (см. _get_wm_derived)."""
+    der = _get_wm_derived()
+    key = ("clusters", page_size, allowed)
+    pages = _WM_PAGES_CACHE.get(key)
+    if pages is None:
         # если список разрешённых пуст — показываем все (фолбэк),
         # иначе — только кластеры, где есть разрешённый склад
-        if allowed and wid not in allowed:
-            continue
-        if cid not in seen:
-            seen[cid] = cname or f"Кластер {cid}"
-    cids = sorted(seen.keys(), key=lambda x: seen[x])
-    pages = [cids[i : i + page_size] for i in range(0, len(cids), page_size)]
-    return pages or [[]]
+        if allowed:
+            wid2cid = der["wid2cid"]
+            cids_ok = {wid2cid[w] for w in allowed if w in wid2cid}
+            cids = [c for c in der["cid_sorted"] if c in cids_ok]
+        else:
+            cids = der["cid_sorted"]
+        pages = _WM_PAGES_CACHE[key] = _chunk_pages(cids, page_size)
+    return pages, der["cid2name"]
 
 
 def _kb_clusters(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
-    pages = _clusters_pages(page_size)
+    allowed = _allowed_wids()
+    _get_wm_derived()  # актуализирует версию справочника
+    return _build_kb_clusters(page, page_size, allowed, _WM_CACHE["ver"])
+
+
+@functools.lru_cache(maxsize=64)
+def _build_kb_clusters(
+    page: int, page_size: int, allowed: frozenset, wm_ver: tuple
+) -> InlineKeyboardMarkup:
+    pages, cid2name = _clusters_data(page_size, allowed)
     page = max(0, min(page, len(pages) - 1))
-    wm = get_warehouses_map()
-    cid2name: Dict[int, str] = {}
-    for _wid, (_wn, cid, cname) in wm.items():
-        if cid and cid not in cid2name:
-            cid2name[int(cid)] = cname or f"Кластер {cid}"
 
     rows: List[List[InlineKeyboardButton]] = []
     for cid in pages[page]:
@@ -311,41 +660,51 @@ def _kb_clusters(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
         )
     nav_row: List[InlineKeyboardButton] = []
     if page > 0:
-        nav_row.append(InlineKeyboardButton(text="« Назад", callback_data=f"need:clusters:page:{
-                    page - 1}"))
+        nav_row.append(_back_btn(f"need:clusters:page:{page - 1}"))
     nav_row.append(
         InlineKeyboardButton(
             text=f"Стр. {page + 1}/{len(pages)}", callback_data="need:clusters:nop"
         )
     )
     if page < len(pages) - 1:
-        nav_row.append(InlineKeyboardButton(text="Вперёд »", callback_data=f"need:clusters:page:{
-                    page + 1}"))
+        nav_row.append(_fwd_btn(f"need:clusters:page:{page + 1}"))
     rows.append(nav_row)
     rows.append([InlineKeyboardButton(text="↩️ К отчёту", callback_data="shipments:need")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def _wh_pages(page_size: int = 10) -> List[List[int]]:
+def _wh_pages_for(page_size: int, allowed: frozenset) -> List[List[int]]:
     """
     ⚙️ В меню «По складам» выводим только склады с положительным спросом (ΣD/день > 0).
     При отсутствии такого списка (фолбэк) — выводим все.
     """
-    wm = get_warehouses_map()
-    allowed = set(get_positive_demand_wids() or [])
-    all_sorted = sorted(wm.keys(), key=lambda w: (wm[w][2], wm[w][0], int(w)))
-    if allowed:
-        wids = [w for w in all_sorted if w in allowed]
-    else:
-        wids = all_sorted
-    return [wids[i : i + page_size] for i in range(0, len(wids), page_size)] or [[]]
+    der = _get_wm_derived()
+    key = ("whs", page_size, allowed)
+    pages = _WM_PAGES_CACHE.get(key)
+    if pages is None:
+        all_sorted = der["sorted_wids"]
+        wids = [w for w in all_sorted if w in allowed] if allowed else all_sorted
+        pages = _WM_PAGES_CACHE[key] = _chunk_pages(wids, page_size)
+    return pages
 
 
-def _kb_whs(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
-    pages = _wh_pages(page_size)
+def _kb_whs(
+    page: int = 0, page_size: int = 10, *, closed: Optional[frozenset[int]] = None
+) -> InlineKeyboardMarkup:
+    allowed = _allowed_wids()
+    _get_wm_derived()  # актуализирует версию справочника
+    if closed is None:
+        closed = _load_closed_wids()
+    return _build_kb_whs(page, page_size, closed, allowed, _WM_CACHE["ver"])
+
+
+@functools.lru_cache(maxsize=64)
+def _build_kb_whs(
+    page: int, page_size: int, closed: frozenset, allowed: frozenset, wm_ver: tuple
+) -> InlineKeyboardMarkup:
+    pages = _wh_pages_for(page_size, allowed)
     page = max(0, min(page, len(pages) - 1))
-    wm = get_warehouses_map()
-    closed = set(_load_closed_wids())
+    wm = _get_wm_derived()["wm"]
 
     rows: List[List[InlineKeyboardButton]] = []
     for wid in pages[page]:
@@ -360,14 +719,12 @@ def _kb_whs(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
         )
     nav_row: List[InlineKeyboardButton] = []
     if page > 0:
-        nav_row.append(InlineKeyboardButton(text="« Назад", callback_data=f"need:whs:page:{
-                    page - 1}"))
+        nav_row.append(_back_btn(f"need:whs:page:{page - 1}"))
     nav_row.append(
         InlineKeyboardButton(text=f"Стр. {page + 1}/{len(pages)}", callback_data="need:whs:nop")
     )
     if page < len(pages) - 1:
-        nav_row.append(InlineKeyboardButton(text="Вперёд »", callback_data=f"need:whs:page:{
-                    page + 1}"))
+        nav_row.append(_fwd_btn(f"need:whs:page:{page + 1}"))
     rows.append(nav_row)
     rows.append([InlineKeyboardButton(text="↩️ К отчёту", callback_data="shipments:need")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -378,107 +735,113 @@ def _kb_whs(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _split_head_body_legend(text: str) -> Tuple[List[str], List[str], List[str]]:
-    lines = text.splitlines()
-    leg_idx = None
-    for i, ln in enumerate(lines):
+# префиксы заголовков карточек (str.startswith с кортежем — одна проверка на строку)
+_TITLE_PREFIXES: Tuple[str, ...] = ("✅ ", "🔴 ", "🟠 ", "🟢 ", "🟥 ", "🟨 ", "🟩 ", "🚫 ")
+
+
+def _tg_len(s: str) -> int:
+    """Длина в UTF-16 code units — так Telegram считает лимит (эмодзи = 2 единицы)."""
+    return len(s.encode("utf-16-le")) >> 1
+
+
+def _paginate_only_if_needed(full_text: str) -> List[str]:
+    # символ занимает 1–2 единицы UTF-16: по len() без кодирования решаются оба крайних случая
+    n = len(full_text)
+    if n * 2 <= TG_MAX or (n <= TG_MAX and _tg_len(full_text) <= TG_MAX):
+        return [full_text]
+    return _paginate_single_pass(full_text)
+
+
+def _paginate_single_pass(text: str) -> List[str]:
+    """
+    Один проход по строкам: шапка (5 строк) → карточки → «Легенда:» до конца.
+    Карточка закрывается пустой строкой или следующим заголовком; пустые карточки отбрасываем.
+    """
+    head: List[str] = []
+    legend: List[str] = []
+    blocks: List[Tuple[str, int]] = []  # (текст карточки, длина с переводом строки)
+    cur: List[str] = []
+    cur_len = 0
+    cur_has_text = False
+
+    lines = iter(text.splitlines())
+    for ln in lines:
         if ln.strip().startswith("Легенда:"):
-            leg_idx = i
+            # легенда внутри первых 5 строк: шапка — 5 строк, если они есть, иначе всё до легенды
+            rest = list(lines)
+            if len(head) + 1 + len(rest) >= 5:
+                all_lines = head + [ln] + rest
+                legend = all_lines[len(head) :]
+                head = all_lines[:5]
+            else:
+                legend = [ln] + rest
+            break
+        head.append(ln)
+        if len(head) == 5:
             break
-    if leg_idx is None:
-        head = lines[:5] if len(lines) >= 5 else lines[:]
-        body = lines[5:]
-        legend = []
-        return head, body, legend
-    head = lines[:5] if len(lines) >= 5 else lines[:leg_idx]
-    legend = lines[leg_idx:]
-    body = lines[len(head) : leg_idx]
-    while body and body[0] == "":
-        body = body[1:]
-    while body and body[-1] == "":
-        body = body[:-1]
-    return head, body, legend
-
-
-def _split_body_into_unit_blocks(body: List[str]) -> List[List[str]]:
-    blocks: List[List[str]] = []
-    cur: List[str] = []
 
-    def _is_title_line(s: str) -> bool:
-        s = s.strip()
-        return (
-            s.startswith("✅ ")
-            or s.startswith("🔴 ")
-            or s.startswith("🟠 ")
-            or s.startswith("🟢 ")
-            or s.startswith("🟥 ")
-            or s.startswith("🟨 ")
-            or s.startswith("🟩 ")
-            or s.startswith("🚫 ")
-        ) and s.endswith(":")
-
-    for ln in body:
-        if _is_title_line(ln):
-            if cur:
+    if not legend:
+        for ln in lines:
+            st = ln.strip()
+            if st.startswith("Легенда:"):
+                legend = [ln]
+                legend += lines
+                break
+            if st.endswith(":") and st.startswith(_TITLE_PREFIXES) and cur:
                 if cur[-1] != "":
                     cur.append("")
-                blocks.append(cur)
-                cur = []
-        cur.append(ln)
-        if ln == "" and cur:
-            blocks.append(cur)
-            cur = []
-    if cur:
+                    cur_len += 1
+                if cur_has_text:
+                    blocks.append(("\n".join(cur), cur_len))
+                cur, cur_len, cur_has_text = [], 0, False
+            cur.append(ln)
+            cur_len += _tg_len(ln) + 1
+            if st:
+                cur_has_text = True
+            if ln == "":
+                if cur_has_text:
+                    blocks.append(("\n".join(cur), cur_len))
+                cur, cur_len, cur_has_text = [], 0, False
+    if cur and cur_has_text:
         if cur[-1] != "":
             cur.append("")
-        blocks.append(cur)
-    return [b for b in blocks if any(x.strip() for x in b)]
+            cur_len += 1
+        blocks.append(("\n".join(cur), cur_len))
 
-
-def _paginate_only_if_needed(full_text: str) -> List[str]:
-    if len(full_text) <= TG_MAX:
-        return [full_text]
-    head, body, legend = _split_head_body_legend(full_text)
-    blocks = _split_body_into_unit_blocks(body)
-    pages: List[str] = []
     base_head = "\n".join(head)
     base_legend = "\n".join(legend) if legend else ""
-    head_len = len(base_head) + 1
-    legend_len = (1 + len(base_legend)) if base_legend else 0
+    head_len = _tg_len(base_head) + 1
+    legend_len = (1 + _tg_len(base_legend)) if base_legend else 0
     max_cards_len = TG_MAX - head_len - legend_len
     if max_cards_len < 200:
         max_cards_len = max(200, TG_MAX // 2)
 
-    curr_lines: List[str] = []
-    curr_len = 0
+    # каждая карточка оканчивается пустой строкой, поэтому страница —
+    # это шапка, карточки и легенда, склеенные одним join по готовым кускам
+    page_parts: List[str] = [base_head] if head else []
+    tail_parts: List[str] = [base_legend] if legend else []
 
-    def _flush():
-        page_lines = head[:] + curr_lines[:]
-        if not page_lines or page_lines[-1] != "":
-            page_lines.append("")
-        if legend:
-            page_lines += legend
-        pages.append("\n".join(page_lines))
-
-    for b in blocks:
-        block_text = "\n".join(b)
-        blen = len(block_text) + 1
-        if curr_len == 0:
-            curr_lines += b
-            curr_len += blen
-            continue
-        if curr_len + blen <= max_cards_len:
-            curr_lines += b
-            curr_len += blen
-        else:
-            _flush()
-            curr_lines = b[:]
-            curr_len = blen
-    if curr_lines:
-        _flush()
+    pages: List[str] = []
+    curr_blocks: List[str] = []
+    curr_len = 0
+    for btext, blen in blocks:
+        if curr_len and curr_len + blen > max_cards_len:
+            pages.append("\n".join(page_parts + curr_blocks + tail_parts))
+            curr_blocks = []
+            curr_len = 0
+        curr_blocks.append(btext)
+        curr_len += blen
+    if curr_blocks:
+        pages.append("\n".join(page_parts + curr_blocks + tail_parts))
     return pages
 
 
+@functools.lru_cache(maxsize=32)
+def _paginate_only_if_needed_cached(full_text: str) -> Tuple[str, ...]:
+    # разбиение детерминировано по тексту — повторное листание того же отчёта без пересчёта
+    return tuple(_paginate_only_if_needed(full_text))
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Вспомогательная обёртка для календаря: добавляем кнопку «Снять дату»
 # ─────────────────────────────────────────────────────────────────────────────
@@ -503,19 +866,19 @@ def _calendar_with_clear(kb: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
 
 @router.callback_query(F.data == "shipments:need")
 async def need_root(cb: CallbackQuery):
-    await _safe_answer(cb)
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
+    ack = asyncio.create_task(_safe_answer(cb))
+    S = _current_S()
     scope = "sku"
-    data = compute_need(scope, dispatch_days=S)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
+    pages = await _need_pages(scope, S)
     page_idx = 0
-    await _safe_edit(
-        cb,
-        pages[page_idx],
-        parse_mode="HTML",
-        reply_markup=_kb_need_root(scope, page=page_idx, pages=len(pages)),
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[page_idx],
+            parse_mode="HTML",
+            reply_markup=_kb_need_root(scope, page=page_idx, pages=len(pages)),
+        ),
     )
 
 
@@ -526,51 +889,54 @@ async def need_root(cb: CallbackQuery):
 
 @router.callback_query(F.data == "need:view:sku")
 async def need_view_sku(cb: CallbackQuery):
-    await _safe_answer(cb)
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
-    data = compute_need("sku", dispatch_days=S)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb, pages[0], parse_mode="HTML", reply_markup=_kb_need_root("sku", page=0, pages=len(pages))
+    ack = asyncio.create_task(_safe_answer(cb))
+    S = _current_S()
+    pages = await _need_pages("sku", S)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_root("sku", page=0, pages=len(pages)),
+        ),
     )
 
 
 @router.callback_query(F.data == "need:view:cluster")
 async def need_view_clusters_menu(cb: CallbackQuery):
-    await _safe_answer(cb)
+    ack = asyncio.create_task(_safe_answer(cb))
     text = "<b>Выберите кластер</b>\nПокажем детализацию по SKU."
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_clusters(page=0))
+    await asyncio.gather(
+        ack, _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_clusters(page=0))
+    )
 
 
 @router.callback_query(F.data == "need:view:warehouse")
 async def need_view_wh_menu(cb: CallbackQuery):
-    await _safe_answer(cb)
+    ack = asyncio.create_task(_safe_answer(cb))
     text = "<b>Выберите склад</b>\nПокажем детализацию по SKU."
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_whs(page=0))
+    await asyncio.gather(ack, _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_whs(page=0)))
 
 
 @router.callback_query(F.data.startswith("need:clusters:page:"))
 async def need_clusters_page(cb: CallbackQuery):
-    await _safe_answer(cb)
-    try:
-        page = int(cb.data.split(":")[-1])
-    except Exception:
-        page = 0
+    ack = asyncio.create_task(_safe_answer(cb))
+    page = _tail_int(cb.data, 0)
     text = "<b>Выберите кластер</b>\nПокажем детализацию по SKU."
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_clusters(page=page))
+    await asyncio.gather(
+        ack, _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_clusters(page=page))
+    )
 
 
 @router.callback_query(F.data.startswith("need:whs:page:"))
 async def need_whs_page(cb: CallbackQuery):
-    await _safe_answer(cb)
-    try:
-        page = int(cb.data.split(":")[-1])
-    except Exception:
-        page = 0
+    ack = asyncio.create_task(_safe_answer(cb))
+    page = _tail_int(cb.data, 0)
     text = "<b>Выберите склад</b>\nПокажем детализацию по SKU."
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_whs(page=page))
+    await asyncio.gather(
+        ack, _safe_edit(cb, text, parse_mode="HTML", reply_markup=_kb_whs(page=page))
+    )
 
 
 # выбор кластера/склада → детализация по SKU
@@ -578,48 +944,44 @@ async def need_whs_page(cb: CallbackQuery):
 
 @router.callback_query(F.data.startswith("need:cluster:"))
 async def need_cluster_detail(cb: CallbackQuery):
-    await _safe_answer(cb)
-    try:
-        cid = int(cb.data.split(":")[-1])
-    except Exception:
-        cid = None
+    ack = asyncio.create_task(_safe_answer(cb))
+    cid = _tail_int(cb.data)
     if cid is None:
+        await ack
         return
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
-    data = compute_need("sku", dispatch_days=S, filter_cluster=cid)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb,
-        pages[0],
-        parse_mode="HTML",
-        reply_markup=_kb_need_filtered(
-            "sku", page=0, pages=len(pages), filter_kind="cluster", filter_id=cid
+    S = _current_S()
+    pages = await _need_pages("sku", S, "cluster", cid)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_filtered(
+                "sku", page=0, pages=len(pages), filter_kind="cluster", filter_id=cid
+            ),
         ),
     )
 
 
 @router.callback_query(F.data.startswith("need:wh:"))
 async def need_wh_detail(cb: CallbackQuery):
-    await _safe_answer(cb)
-    try:
-        wid = int(cb.data.split(":")[-1])
-    except Exception:
-        wid = None
+    ack = asyncio.create_task(_safe_answer(cb))
+    wid = _tail_int(cb.data)
     if wid is None:
+        await ack
         return
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
-    data = compute_need("sku", dispatch_days=S, filter_warehouse=wid)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb,
-        pages[0],
-        parse_mode="HTML",
-        reply_markup=_kb_need_filtered(
-            "sku", page=0, pages=len(pages), filter_kind="warehouse", filter_id=wid
+    S = _current_S()
+    pages = await _need_pages("sku", S, "warehouse", wid)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_filtered(
+                "sku", page=0, pages=len(pages), filter_kind="warehouse", filter_id=wid
+            ),
         ),
     )
 
@@ -631,40 +993,28 @@ async def need_wh_detail(cb: CallbackQuery):
 
 @router.callback_query(F.data.startswith("need:page:"))
 async def need_page(cb: CallbackQuery):
-    await _safe_answer(cb)
-    parts = cb.data.split(":")
+    ack = asyncio.create_task(_safe_answer(cb))
+    parts = cb.data.split(":", 5)
     # варианты:
     # need:page:<scope>:<page>
     # need:page:<scope>:<filter_kind>:<filter_id>:<page>
     if len(parts) < 4:
+        await ack
         return
     scope = parts[2]
     filter_kind = None
     filter_id: Optional[int] = None
-    try:
-        if len(parts) == 4:
-            page_idx = int(parts[3])
-        elif len(parts) >= 6:
-            filter_kind = parts[3]
-            filter_id = int(parts[4])
-            page_idx = int(parts[5])
-        else:
-            page_idx = 0
-    except Exception:
-        page_idx = 0
+    page_idx = 0
+    if len(parts) == 4:
+        page_idx = int(parts[3]) if parts[3].isdecimal() else 0
+    elif len(parts) == 6 and parts[4].isdecimal():
+        filter_kind = parts[3]
+        filter_id = int(parts[4])
+        page_idx = int(parts[5]) if parts[5].isdecimal() else 0
 
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
+    S = _current_S()
 
-    if filter_kind == "cluster" and filter_id is not None:
-        data = compute_need(scope, dispatch_days=S, filter_cluster=filter_id)
-    elif filter_kind == "warehouse" and filter_id is not None:
-        data = compute_need(scope, dispatch_days=S, filter_warehouse=filter_id)
-    else:
-        data = compute_need(scope, dispatch_days=S)
-
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
+    pages = await _need_pages(scope, S, filter_kind, filter_id)
     page_idx = max(0, min(page_idx, len(pages) - 1))
 
     if filter_kind in {"cluster", "warehouse"} and filter_id is not None:
@@ -673,7 +1023,7 @@ async def need_page(cb: CallbackQuery):
         )
     else:
         kb = _kb_need_root(scope, page=page_idx, pages=len(pages))
-    await _safe_edit(cb, pages[page_idx], parse_mode="HTML", reply_markup=kb)
+    await asyncio.gather(ack, _safe_edit(cb, pages[page_idx], parse_mode="HTML", reply_markup=kb))
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -683,9 +1033,9 @@ async def need_page(cb: CallbackQuery):
 
 @router.callback_query(F.data == "need:date")
 async def need_date(cb: CallbackQuery):
-    await _safe_answer(cb)
+    ack = asyncio.create_task(_safe_answer(cb))
     if shipments_calendar_kb is None:
-        await cb.message.answer("🗓 Календарь недоступен в этой сборке.")
+        await asyncio.gather(ack, cb.message.answer("🗓 Календарь недоступен в этой сборке."))
         return
     disp = _load_dispatch()
     selected = disp.get("date") or None
@@ -709,13 +1059,13 @@ async def need_date(cb: CallbackQuery):
         "После подтверждения рассчитаем S — число дней до отгрузки\n"
         "и применим во всех расчётах (лаг до отгрузки)."
     )
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=kb)
+    await asyncio.gather(ack, _safe_edit(cb, text, parse_mode="HTML", reply_markup=kb))
 
 
 @router.callback_query(F.data.startswith("ship:cal:pick:"))
 async def need_date_pick(cb: CallbackQuery):
-    await _safe_answer(cb)
-    iso = cb.data.split(":")[-1]
+    ack = asyncio.create_task(_safe_answer(cb))
+    iso = cb.data.rpartition(":")[2]
     try:
         d = _dt.datetime.strptime(iso, "%Y-%m-%d").date()
         vy, vm = d.year, d.month
@@ -729,12 +1079,16 @@ async def need_date_pick(cb: CallbackQuery):
             prefix="ship:cal", selected=iso, year=vy, month=vm
         )  # type: ignore
         kb = _calendar_with_clear(kb)  # 🔧 держим кнопку «Снять дату»
-        await _safe_edit(cb, cb.message.html_text or "🗓", parse_mode="HTML", reply_markup=kb)
+        await asyncio.gather(
+            ack, _safe_edit(cb, cb.message.html_text or "🗓", parse_mode="HTML", reply_markup=kb)
+        )
+    else:
+        await ack
 
 
 @router.callback_query(F.data == "ship:cal:prev")
 async def need_date_prev(cb: CallbackQuery):
-    await _safe_answer(cb)
+    ack = asyncio.create_task(_safe_answer(cb))
     disp = _load_dispatch()
     selected = disp.get("date") or None
     vy = int(disp.get("view_year") or _dt.date.today().year)
@@ -746,12 +1100,16 @@ async def need_date_prev(cb: CallbackQuery):
             prefix="ship:cal", selected=selected, year=vy, month=vm
         )  # type: ignore
         kb = _calendar_with_clear(kb)  # 🔧 держим кнопку «Снять дату»
-        await _safe_edit(cb, cb.message.html_text or "🗓", parse_mode="HTML", reply_markup=kb)
+        await asyncio.gather(
+            ack, _safe_edit(cb, cb.message.html_text or "🗓", parse_mode="HTML", reply_markup=kb)
+        )
+    else:
+        await ack
 
 
 @router.callback_query(F.data == "ship:cal:next")
 async def need_date_next(cb: CallbackQuery):
-    await _safe_answer(cb)
+    ack = asyncio.create_task(_safe_answer(cb))
     disp = _load_dispatch()
     selected = disp.get("date") or None
     vy = int(disp.get("view_year") or _dt.date.today().year)
@@ -763,36 +1121,47 @@ async def need_date_next(cb: CallbackQuery):
             prefix="ship:cal", selected=selected, year=vy, month=vm
         )  # type: ignore
         kb = _calendar_with_clear(kb)  # 🔧 держим кнопку «Снять дату»
-        await _safe_edit(cb, cb.message.html_text or "🗓", parse_mode="HTML", reply_markup=kb)
+        await asyncio.gather(
+            ack, _safe_edit(cb, cb.message.html_text or "🗓", parse_mode="HTML", reply_markup=kb)
+        )
+    else:
+        await ack
 
 
 @router.callback_query(F.data == "ship:cal:confirm")
 async def need_date_confirm(cb: CallbackQuery):
-    await _safe_answer(cb, "Дата принята")
+    ack = asyncio.create_task(_safe_answer(cb, "Дата принята"))
     disp = _load_dispatch()
     iso = disp.get("date")
     S, iso_ok = _calc_S_days(iso)
     _save_dispatch(iso_ok, S)
     scope = "sku"
-    data = compute_need(scope, dispatch_days=S)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb, pages[0], parse_mode="HTML", reply_markup=_kb_need_root(scope, page=0, pages=len(pages))
+    pages = await _need_pages(scope, S)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_root(scope, page=0, pages=len(pages)),
+        ),
     )
 
 
 @router.callback_query(F.data == "ship:cal:cancel")
 async def need_date_cancel(cb: CallbackQuery):
-    await _safe_answer(cb, "Отмена")
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
+    ack = asyncio.create_task(_safe_answer(cb, "Отмена"))
+    S = _current_S()
     scope = "sku"
-    data = compute_need(scope, dispatch_days=S)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb, pages[0], parse_mode="HTML", reply_markup=_kb_need_root(scope, page=0, pages=len(pages))
+    pages = await _need_pages(scope, S)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_root(scope, page=0, pages=len(pages)),
+        ),
     )
 
 
@@ -801,13 +1170,17 @@ async def need_date_cancel(cb: CallbackQuery):
 
 @router.callback_query(F.data == "need:date:clear")
 async def need_date_clear(cb: CallbackQuery):
-    await _safe_answer(cb, "Дата отгрузки снята")
-    _save_dispatch(None, 0)  # S=0 и date=None
-    data = compute_need("sku", dispatch_days=0)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb, pages[0], parse_mode="HTML", reply_markup=_kb_need_root("sku", page=0, pages=len(pages))
+    ack = asyncio.create_task(_safe_answer(cb, "Дата отгрузки снята"))
+    _save_dispatch(None, 0)  # S=0 и date=None (кэш расчёта сбрасывается там же)
+    pages = await _need_pages("sku", 0)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_root("sku", page=0, pages=len(pages)),
+        ),
     )
 
 
@@ -816,39 +1189,33 @@ async def need_date_clear(cb: CallbackQuery):
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _closed_wh_pages(page_size: int = 10) -> List[List[int]]:
+def _closed_wh_pages(
+    page_size: int = 10, *, allowed: Optional[frozenset[int]] = None
+) -> List[List[int]]:
     """
     ⚙️ В «🚫 Закрытые склады» тоже показываем ТОЛЬКО склады с положительным спросом (ΣD/день > 0).
        Если список положительных пуст (фолбэк) — показываем все склады.
     """
-    wm = get_warehouses_map()  # wid -> (wname, cid, cname)
-    allowed = set(get_positive_demand_wids() or [])
-    all_wids = sorted(wm.keys(), key=lambda w: (wm[w][2], wm[w][0], int(w)))
-    if allowed:
-        wids = [w for w in all_wids if w in allowed]
-    else:
-        wids = all_wids
-    pages: List[List[int]] = []
-    for i in range(0, len(wids), page_size):
-        pages.append(wids[i : i + page_size])
-    if not pages:
-        pages = [[]]
-    return pages
+    if allowed is None:
+        allowed = _allowed_wids()
+    return _wh_pages_for(page_size, allowed)
 
 
-def _closed_wh_text() -> str:
-    return (
-        "<b>🚫 Закрытые склады</b>\n"
-        "Выберите склады, куда <u>нельзя</u> отгружать. Отметка — 🚫.\n"
-        "После изменений нажмите «Сохранить», чтобы вернуться к отчёту."
-    )
+_CLOSED_WH_TEXT = (
+    "<b>🚫 Закрытые склады</b>\n"
+    "Выберите склады, куда <u>нельзя</u> отгружать. Отметка — 🚫.\n"
+    "После изменений нажмите «Сохранить», чтобы вернуться к отчёту."
+)
 
 
-def _kb_closed_wh(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
+def _kb_closed_wh(
+    page: int = 0, page_size: int = 10, *, closed: Optional[frozenset[int]] = None
+) -> InlineKeyboardMarkup:
     pages = _closed_wh_pages(page_size=page_size)
     page = max(0, min(page, len(pages) - 1))
-    wm = get_warehouses_map()
-    closed = set(_load_closed_wids())
+    wm = _get_wm_derived()["wm"]
+    if closed is None:
+        closed = _load_closed_wids()
     rows: List[List[InlineKeyboardButton]] = []
 
     for wid in pages[page]:
@@ -862,14 +1229,12 @@ def _kb_closed_wh(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
 
     nav_row: List[InlineKeyboardButton] = []
     if page > 0:
-        nav_row.append(InlineKeyboardButton(text="« Назад", callback_data=f"need:closed:page:{
-                    page - 1}"))
+        nav_row.append(_back_btn(f"need:closed:page:{page - 1}"))
     nav_row.append(
         InlineKeyboardButton(text=f"Стр. {page + 1}/{len(pages)}", callback_data="need:closed:nop")
     )
     if page < len(pages) - 1:
-        nav_row.append(InlineKeyboardButton(text="Вперёд »", callback_data=f"need:closed:page:{
-                    page + 1}"))
+        nav_row.append(_fwd_btn(f"need:closed:page:{page + 1}"))
     if nav_row:
         rows.append(nav_row)
 
@@ -886,64 +1251,67 @@ def _kb_closed_wh(page: int = 0, page_size: int = 10) -> InlineKeyboardMarkup:
 
 @router.callback_query(F.data.startswith("need:closed:page:"))
 async def closed_wh_page(cb: CallbackQuery):
-    await _safe_answer(cb)
-    try:
-        page = int(cb.data.split(":")[-1])
-    except Exception:
-        page = 0
-    await _safe_edit(
-        cb, _closed_wh_text(), parse_mode="HTML", reply_markup=_kb_closed_wh(page=page)
+    ack = asyncio.create_task(_safe_answer(cb))
+    page = _tail_int(cb.data, 0)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb, _CLOSED_WH_TEXT, parse_mode="HTML", reply_markup=_kb_closed_wh(page=page)
+        ),
     )
 
 
-@router.callback_query(F.data.startswith("need:closed:toggle:"))
-async def closed_wh_toggle(cb: CallbackQuery):
-    await _safe_answer(cb)
-    parts = cb.data.split(":")
-    try:
-        # need:closed:toggle:<wid>:<page>
-        wid = int(parts[3])
-        page = int(parts[4])
-    except Exception:
-        wid, page = None, 0
-    if wid is None:
-        return
-    closed = set(_load_closed_wids())
-    if wid in closed:
-        closed.remove(wid)
-    else:
-        closed.add(wid)
-    _save_closed_wids(sorted(closed))
+# need:closed:toggle:<wid>:<page>
+_RE_CLOSED_TOGGLE = re.compile(r"need:closed:toggle:(\d+):(\d+)")
+
+
+@router.callback_query(F.data.regexp(_RE_CLOSED_TOGGLE, mode="fullmatch").as_("m"))
+async def closed_wh_toggle(cb: CallbackQuery, m: re.Match[str]):
+    ack = asyncio.create_task(_safe_answer(cb))
+    wid, page = int(m[1]), int(m[2])
+    _toggle_closed_wid(wid)
     # ререндер текущей страницы (маркер должен обновиться сразу)
-    await _safe_edit(
-        cb, _closed_wh_text(), parse_mode="HTML", reply_markup=_kb_closed_wh(page=page)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb, _CLOSED_WH_TEXT, parse_mode="HTML", reply_markup=_kb_closed_wh(page=page)
+        ),
     )
 
 
 @router.callback_query(F.data == "need:closed:reset")
 async def closed_wh_reset(cb: CallbackQuery):
-    await _safe_answer(cb, "Список закрытых складов очищен")
+    ack = asyncio.create_task(_safe_answer(cb, "Список закрытых складов очищен"))
     _save_closed_wids([])
-    await _safe_edit(cb, _closed_wh_text(), parse_mode="HTML", reply_markup=_kb_closed_wh(page=0))
+    await asyncio.gather(
+        ack,
+        _safe_edit(cb, _CLOSED_WH_TEXT, parse_mode="HTML", reply_markup=_kb_closed_wh(page=0)),
+    )
 
 
 @router.callback_query(F.data == "need:closed:save")
 async def closed_wh_save(cb: CallbackQuery):
-    await _safe_answer(cb, "Сохранено")
-    await closed_wh_back(cb)
+    # один ответ на callback (с текстом) — параллельно с возвратом к отчёту
+    await _closed_wh_to_report(cb, asyncio.create_task(_safe_answer(cb, "Сохранено")))
 
 
 @router.callback_query(F.data == "need:closed:back")
 async def closed_wh_back(cb: CallbackQuery):
-    await _safe_answer(cb)
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
+    await _closed_wh_to_report(cb, asyncio.create_task(_safe_answer(cb)))
+
+
+async def _closed_wh_to_report(cb: CallbackQuery, ack: asyncio.Task) -> None:
+    S = _current_S()
     scope = "sku"
-    data = compute_need(scope, dispatch_days=S)
-    full_text = format_need_text(data)
-    pages = _paginate_only_if_needed(full_text)
-    await _safe_edit(
-        cb, pages[0], parse_mode="HTML", reply_markup=_kb_need_root(scope, page=0, pages=len(pages))
+    pages = await _need_pages(scope, S)
+    await asyncio.gather(
+        ack,
+        _safe_edit(
+            cb,
+            pages[0],
+            parse_mode="HTML",
+            reply_markup=_kb_need_root(scope, page=0, pages=len(pages)),
+        ),
     )
 
 
@@ -952,39 +1320,45 @@ async def closed_wh_back(cb: CallbackQuery):
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-@router.callback_query(F.data.startswith("need:export:"))
-async def need_export(cb: CallbackQuery):
+# поддержка фильтра: need:export:<scope>[:cluster|warehouse:<id>]
+_RE_EXPORT = re.compile(r"need:export:\w+(?::(cluster|warehouse):(\d+))?")
+
+# Уже отправленные выгрузки: (S, фильтр, сигнатура данных) → file_id документа в Telegram.
+# Пока сигнатура (_need_sig) та же, данные те же — повторный клик не пересобирает xlsx
+# и не загружает файл заново.
+_EXPORT_FILE_IDS: Dict[tuple, str] = {}
+_EXPORT_FILE_IDS_MAX = 16
+_EXPORT_CAPTION = "📥 Отчёт «ОТГРУЗКИ — РЕКОМЕНДАЦИИ» (Excel, новая форма v3.8)"
+
+
+@router.callback_query(F.data.regexp(_RE_EXPORT, mode="fullmatch").as_("m"))
+async def need_export(cb: CallbackQuery, m: re.Match[str]):
     await _safe_answer(cb, "Готовлю Excel (новая форма)…")
-    disp = _load_dispatch()
-    S = int(disp.get("days") or 0)
+    S = _current_S()
 
-    # поддержка фильтра: need:export:<scope>[:cluster|warehouse:<id>]
-    parts = cb.data.split(":")
-    scope = parts[2] if len(parts) >= 3 else "sku"
-    filter_kind = parts[3] if len(parts) >= 5 else None
-    filter_id = None
-    try:
-        if filter_kind in {"cluster", "warehouse"}:
-            filter_id = int(parts[4])
-    except Exception:
-        filter_kind = None
-        filter_id = None
+    filter_kind: Optional[str] = None
+    filter_id: Optional[int] = None
+    if m[2] is not None:
+        filter_kind, filter_id = m[1], int(m[2])
+
+    export_key = (S, filter_kind, filter_id, _need_sig())
+    file_id = _EXPORT_FILE_IDS.get(export_key)
+    if file_id is not None:
+        try:
+            await cb.message.answer_document(file_id, caption=_EXPORT_CAPTION)
+            return
+        except Exception:
+            _EXPORT_FILE_IDS.pop(export_key, None)
 
     # ДАННЫЕ: применяем фильтр ко всем листам (товары/кластеры/склады)
-    if filter_kind == "cluster" and filter_id is not None:
-        data_sku = compute_need("sku", dispatch_days=S, filter_cluster=filter_id)
-        data_cluster = compute_need("cluster", dispatch_days=S, filter_cluster=filter_id)
-        data_wh = compute_need("warehouse", dispatch_days=S, filter_cluster=filter_id)
+    data_sku = await _need_data("sku", S, filter_kind, filter_id)
+    data_cluster = await _need_data("cluster", S, filter_kind, filter_id)
+    data_wh = await _need_data("warehouse", S, filter_kind, filter_id)
+    if filter_kind == "cluster":
         export_suffix = f"_cluster{filter_id}"
-    elif filter_kind == "warehouse" and filter_id is not None:
-        data_sku = compute_need("sku", dispatch_days=S, filter_warehouse=filter_id)
-        data_cluster = compute_need("cluster", dispatch_days=S, filter_warehouse=filter_id)
-        data_wh = compute_need("warehouse", dispatch_days=S, filter_warehouse=filter_id)
+    elif filter_kind == "warehouse":
         export_suffix = f"_wh{filter_id}"
     else:
-        data_sku = compute_need("sku", dispatch_days=S)
-        data_cluster = compute_need("cluster", dispatch_days=S)
-        data_wh = compute_need("warehouse", dispatch_days=S)
         export_suffix = ""
 
     reports_dir = resolve_reports_dir()
@@ -1003,9 +1377,11 @@ async def need_export(cb: CallbackQuery):
 
     try:
         out_path = export_need_excel(path, data_sku, data_cluster, data_wh)
-        await cb.message.answer_document(
-            FSInputFile(out_path),
-            caption="📥 Отчёт «ОТГРУЗКИ — РЕКОМЕНДАЦИИ» (Excel, новая форма v3.8)",
-        )
+        sent = await cb.message.answer_document(FSInputFile(out_path), caption=_EXPORT_CAPTION)
+        doc = getattr(sent, "document", None)
+        if doc is not None:
+            if len(_EXPORT_FILE_IDS) >= _EXPORT_FILE_IDS_MAX:
+                _EXPORT_FILE_IDS.pop(next(iter(_EXPORT_FILE_IDS)))
+            _EXPORT_FILE_IDS[export_key] = doc.file_id
     except Exception as e:
         await cb.message.answer(f"❗ Не удалось сформировать Excel (новая форма): {e}")
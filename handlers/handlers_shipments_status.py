@@ -1,7 +1,14 @@
 # handlers/handlers_shipments_status.py
 from __future__ import annotations
-from aiogram import Router, F
+import functools
+import heapq
+import re
+import time
+from collections import defaultdict
+
+from aiogram import Router, F, flags
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.callback_answer import CallbackAnswer, CallbackAnswerMiddleware
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
 
@@ -50,7 +57,20 @@ except Exception:
         return str(sku)
 
 
+class _SafeCallbackAnswerMiddleware(CallbackAnswerMiddleware):
+    """Автоответ на callback; устаревший/повторный запрос не роняет хендлер."""
+
+    async def answer(self, event: CallbackQuery, callback_answer: CallbackAnswer):
+        try:
+            return await super().answer(event, callback_answer)
+        except TelegramBadRequest:
+            return None
+
+
 router = Router()
+# Ответ на callback шлёт middleware ДО хендлера — «часики» гаснут сразу, пока идёт
+# перерисовка. Ответ с текстом — через @flags.callback_answer(pre=False).
+router.callback_query.middleware(_SafeCallbackAnswerMiddleware(pre=True))
 TG_MAX = 4096
 
 # ───────── helpers ─────────
@@ -64,26 +84,21 @@ async def _safe_edit(cb: CallbackQuery, text: str, **kwargs):
             raise
 
 
-async def _safe_answer(cb: CallbackQuery, *args, **kwargs):
-    try:
-        await cb.answer(*args, **kwargs)
-    except TelegramBadRequest:
-        pass
-
-
 def _title_for_view(view: str) -> str:
     return "Кластер" if view == "cluster" else "Склад"
 
 
+_ZERO_WORDS = frozenset({"", "none", "null"})
+
+
+@functools.lru_cache(maxsize=4096)
 def _is_zero_like(s: str) -> bool:
-    s_norm = (s or "").strip().lower()
-    if not s_norm:
-        return True
-    if s_norm in {"0", "none", "null"}:
-        return True
-    if s_norm.isdigit() and int(s_norm) == 0:
-        return True
-    return False
+    # значения измерений сильно повторяются (id кластеров/складов) — кэшируем;
+    # числовой путь первым, lower() — только для нечисловых строк
+    s_norm = (s or "").strip()
+    if s_norm.isdigit():
+        return int(s_norm) == 0
+    return s_norm.lower() in _ZERO_WORDS
 
 
 def _looks_module_missing(text: str | None) -> bool:
@@ -137,23 +152,55 @@ def _row_group_key(view: str, row: dict) -> str:
     return name or "unknown"
 
 
+# список групп меняется только с выгрузкой остатков — держим его TTL-окно
+_GROUPS_TTL_SEC = 30.0
+
+
+def _ttl_bucket() -> int:
+    return int(time.monotonic() // _GROUPS_TTL_SEC)
+
+
+@functools.lru_cache(maxsize=8)
+def _sku_rows(view: str, bucket: int) -> tuple[tuple[int, dict], ...]:
+    """Пары (sku, строка) остатков: _extract_sku считается один раз на строку за TTL-окно."""
+    return tuple((_extract_sku(r), r) for r in fetch_stocks_view(view=view) or [])
+
+
+@functools.lru_cache(maxsize=8)
+def _group_index(view: str, bucket: int) -> dict[str, list[tuple[int, dict]]]:
+    """Пары (sku, строка) по ключу группы: _row_group_key считается один раз на строку."""
+    index: dict[str, list[tuple[int, dict]]] = {}
+    for sku, r in _sku_rows(view, bucket):
+        index.setdefault(_row_group_key(view, r), []).append((sku, r))
+    return index
+
+
 def _extract_groups(view: str) -> list[str]:
-    rows = fetch_stocks_view(view=view) or []
-    groups = set()
-    for r in rows:
-        key = _row_group_key(view, r)
-        if key and key.lower() != "unknown" and not _is_zero_like(key):
-            groups.add(key)
-    lst = sorted(groups, key=lambda s: s.lower())[:500]
-    return lst
-
-
-def _view_switch_rows() -> list[list[InlineKeyboardButton]]:
-    return [
-        [InlineKeyboardButton(text="🔢 По SKU", callback_data="shipments:view:sku")],
-        [InlineKeyboardButton(text="🏢 По кластерам", callback_data="shipments:view:cluster")],
-        [InlineKeyboardButton(text="🏭 По складам", callback_data="shipments:view:warehouse")],
+    return list(_extract_groups_cached(view, _ttl_bucket()))
+
+
+@functools.lru_cache(maxsize=8)
+def _extract_groups_cached(view: str, bucket: int) -> tuple[str, ...]:
+    groups = [
+        key
+        for key in _group_index(view, bucket)
+        if key and key.lower() != "unknown" and not _is_zero_like(key)
     ]
+    return tuple(sorted(groups, key=lambda s: s.lower())[:500])
+
+
+# Постоянные ряды кнопок собираем один раз (кнопки — неизменяемые pydantic-модели)
+_VIEW_SWITCH_ROWS: tuple[list[InlineKeyboardButton], ...] = (
+    [InlineKeyboardButton(text="🔢 По SKU", callback_data="shipments:view:sku")],
+    [InlineKeyboardButton(text="🏢 По кластерам", callback_data="shipments:view:cluster")],
+    [InlineKeyboardButton(text="🏭 По складам", callback_data="shipments:view:warehouse")],
+)
+_TAIL_ROWS: tuple[list[InlineKeyboardButton], ...] = (
+    [InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")],
+    [InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")],
+)
+# переключатель видов + «назад/домой» — одинаков для нескольких экранов
+_KB_VIEW_SWITCH = InlineKeyboardMarkup(inline_keyboard=[*_VIEW_SWITCH_ROWS, *_TAIL_ROWS])
 
 
 def _groups_menu(
@@ -161,16 +208,11 @@ def _groups_menu(
 ) -> InlineKeyboardMarkup:
     start = max(page, 0) * page_size
     chunk = groups[start : start + page_size]
-    rows: list[list[InlineKeyboardButton]] = []
-
-    for idx, name in enumerate(chunk, start=start):
-        rows.append(
-            [
-                InlineKeyboardButton(
-                    text=f"📊 {name}", callback_data=f"shipments:group:{view}:pick:{idx}"
-                )
-            ]
-        )
+    pick = f"shipments:group:{view}:pick:"
+    rows: list[list[InlineKeyboardButton]] = [
+        [InlineKeyboardButton(text=f"📊 {name}", callback_data=f"{pick}{idx}")]
+        for idx, name in enumerate(chunk, start=start)
+    ]
 
     nav: list[InlineKeyboardButton] = []
     if start > 0:
@@ -186,9 +228,8 @@ def _groups_menu(
     if nav:
         rows.append(nav)
 
-    rows.extend(_view_switch_rows())
-    rows.append([InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
+    rows.extend(_VIEW_SWITCH_ROWS)
+    rows.extend(_TAIL_ROWS)
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
@@ -213,20 +254,19 @@ def _extract_sku(row: dict) -> int:
 
 def _fallback_status_text(view: str = "sku") -> str:
     # По SKU: короткая витрина топ‑позиции по общему наличию
-    rows = fetch_stocks_view(view="sku") or []
+    rows = _sku_rows("sku", _ttl_bucket())
     if not rows:
         return "🚚 <b>Статус отгрузок</b>\nℹ️ Нет данных для отображения."
-    bucket = {}
-    for r in rows:
-        sku = _extract_sku(r)
+    bucket: defaultdict[int, float] = defaultdict(float)
+    for sku, r in rows:
         if not sku:
             continue
-        bucket.setdefault(sku, 0.0)
         try:
-            bucket[sku] += float(total_on_ozon_from_row(r))
+            val = float(total_on_ozon_from_row(r))
         except Exception:
-            pass
-    items = sorted(bucket.items(), key=lambda kv: -kv[1])[:80]
+            val = 0.0
+        bucket[sku] += val
+    items = heapq.nlargest(80, bucket.items(), key=lambda kv: kv[1])
     lines = []
     for sku, total in items:
         alias = (get_alias_for_sku(int(sku)) or str(sku)).strip() or str(sku)
@@ -236,26 +276,22 @@ def _fallback_status_text(view: str = "sku") -> str:
 
 
 def _fallback_status_text_group(view: str, name: str) -> str:
-    rows = fetch_stocks_view(view=view) or []
-    if not rows:
-        return f"🚚 <b>Статус отгрузок</b>\nℹ️ Нет данных по «{name}»."
-    grp = []
-    for r in rows:
-        if _row_group_key(view, r) == name:
-            grp.append(r)
+    grp = _group_index(view, _ttl_bucket()).get(name)
     if not grp:
         return f"🚚 <b>Статус отгрузок</b>\nℹ️ Нет данных по «{name}»."
     # Выведем позиции SKU и ключевые метрики для группы
     lines = [f"🚚 <b>{_title_for_view(view)}:</b> {name}", ""]
     # SKU → сумма по группе
-    agg = {}
-    for r in grp:
-        sku = _extract_sku(r)
+    agg: defaultdict[int, float] = defaultdict(float)
+    for sku, r in grp:
         if not sku:
             continue
-        agg.setdefault(sku, 0.0)
-        agg[sku] += float(total_on_ozon_from_row(r))
-    for sku, total in sorted(agg.items(), key=lambda kv: -kv[1])[:80]:
+        try:
+            val = float(total_on_ozon_from_row(r))
+        except Exception:
+            val = 0.0
+        agg[sku] += val
+    for sku, total in heapq.nlargest(80, agg.items(), key=lambda kv: kv[1]):
         alias = (get_alias_for_sku(int(sku)) or str(sku)).strip() or str(sku)
         lines.append(f"🔹 {alias}: {int(total)} ед.")
     return "\n".join(lines)
@@ -270,12 +306,7 @@ async def on_shipments_onsale(cb: CallbackQuery, state: FSMContext):
         step="ship_onsale", ship_view="sku", ship_groups=None, ship_groups_page=0
     )
     text = "🚚 <b>Статус отгрузок</b>\nВыберите представление:"
-    rows = _view_switch_rows()
-    rows.append([InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
-    kb = InlineKeyboardMarkup(inline_keyboard=rows)
-    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=kb)
-    await _safe_answer(cb)
+    await _safe_edit(cb, text, parse_mode="HTML", reply_markup=_KB_VIEW_SWITCH)
 
 
 @router.callback_query(
@@ -287,24 +318,18 @@ async def on_shipments_view_switch(cb: CallbackQuery, state: FSMContext):
 
     if view in {"cluster", "warehouse"}:
         groups = _extract_groups(view)
-        rows = _view_switch_rows()
         if not groups:
-            rows.append([InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")])
-            rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
-            kb_empty = InlineKeyboardMarkup(inline_keyboard=rows)
             await _safe_edit(
                 cb,
                 f"🚚 Статус отгрузок — {_title_for_view(view)}: данных нет.",
-                reply_markup=kb_empty,
+                reply_markup=_KB_VIEW_SWITCH,
             )
-            await _safe_answer(cb)
             return
         await state.update_data(ship_groups=groups, ship_groups_page=0)
         kb = _groups_menu(view, groups, page=0)
         await _safe_edit(
             cb, f"🚚 Статус отгрузок — выберите {_title_for_view(view).lower()}:", reply_markup=kb
         )
-        await _safe_answer(cb)
         return
 
     # По SKU — используем основной модуль, либо фолбэк
@@ -315,18 +340,17 @@ async def on_shipments_view_switch(cb: CallbackQuery, state: FSMContext):
     else:
         text = _fallback_status_text(view=view)
 
-    rows = _view_switch_rows()
-    rows.append([InlineKeyboardButton(text="🔙 К отгрузкам", callback_data="shipments")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
-    kb = InlineKeyboardMarkup(inline_keyboard=rows)
-    await _safe_edit(cb, (text or "")[:TG_MAX], parse_mode="HTML", reply_markup=kb)
-    await _safe_answer(cb)
+    await _safe_edit(cb, (text or "")[:TG_MAX], parse_mode="HTML", reply_markup=_KB_VIEW_SWITCH)
+
+
+# shipments:group:<view>:page:<n> / shipments:group:<view>:pick:<idx>
+_RE_GROUP_PAGE = re.compile(r"shipments:group:(\w+):page:(-?\d+)")
+_RE_GROUP_PICK = re.compile(r"shipments:group:(\w+):pick:(-?\d+)")
 
 
-@router.callback_query(F.data.startswith("shipments:group:") & F.data.contains(":page:"))
-async def on_shipments_group_page(cb: CallbackQuery, state: FSMContext):
-    _, _, view, _, page_str = cb.data.split(":")
-    page = max(int(page_str), 0)
+@router.callback_query(F.data.regexp(_RE_GROUP_PAGE, mode="fullmatch").as_("m"))
+async def on_shipments_group_page(cb: CallbackQuery, state: FSMContext, m: re.Match[str]):
+    view, page = m[1], max(int(m[2]), 0)
     data = await state.get_data()
     groups = data.get("ship_groups") or _extract_groups(view)
     await state.update_data(ship_groups=groups, ship_groups_page=page)
@@ -334,20 +358,21 @@ async def on_shipments_group_page(cb: CallbackQuery, state: FSMContext):
     await _safe_edit(
         cb, f"🚚 Статус отгрузок — выберите {_title_for_view(view).lower()}:", reply_markup=kb
     )
-    await _safe_answer(cb)
 
 
-@router.callback_query(F.data.startswith("shipments:group:") & F.data.contains(":pick:"))
-async def on_shipments_group_pick(cb: CallbackQuery, state: FSMContext):
-    _, _, view, _, idx_str = cb.data.split(":")
-    idx = int(idx_str)
+@router.callback_query(F.data.regexp(_RE_GROUP_PICK, mode="fullmatch").as_("m"))
+@flags.callback_answer(pre=False)
+async def on_shipments_group_pick(
+    cb: CallbackQuery, state: FSMContext, callback_answer: CallbackAnswer, m: re.Match[str]
+):
+    view, idx = m[1], int(m[2])
 
     data = await state.get_data()
     groups = data.get("ship_groups") or _extract_groups(view)
     page = int(data.get("ship_groups_page") or 0)
 
     if idx < 0 or idx >= len(groups):
-        await _safe_answer(cb, "Не найдено")
+        callback_answer.text = "Не найдено"
         return
 
     group_name = groups[idx]
@@ -360,4 +385,3 @@ async def on_shipments_group_pick(cb: CallbackQuery, state: FSMContext):
 
     kb = _groups_menu(view, groups, page=page)
     await _safe_edit(cb, (text or "")[:TG_MAX], parse_mode="HTML", reply_markup=kb)
-    await _safe_answer(cb)
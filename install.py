@@ -3,15 +3,24 @@
 
 import os
 import sys
+import shutil
 import subprocess
 from pathlib import Path
 
 
-def run_command(cmd: str, description: str) -> bool:
-    """Выполняет команду и возвращает True, если успешно."""
+def run_command(cmd: str, description: str, stream: bool = False) -> bool:
+    """Выполняет команду и возвращает True, если успешно.
+
+    stream=True — вывод идёт прямо в консоль по мере выполнения (без буфера в памяти);
+    иначе вывод перехватывается и печатается только при ошибке.
+    """
     print(f"\n{description}...")
     try:
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
+        if stream:
+            sys.stdout.flush()
+            subprocess.run(cmd, shell=True, check=True)
+        else:
+            subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
         print(f"✅ {description} выполнено успешно")
         return True
     except subprocess.CalledProcessError as e:
@@ -36,11 +45,14 @@ def check_python_version():
 
 
 def install_dependencies():
-    """Устанавливает зависимости."""
-    return run_command(
-        "pip install -r requirements.txt",
-        "Установка зависимостей"
-    )
+    """Устанавливает зависимости (через uv, если он установлен, — он заметно быстрее pip)."""
+    if shutil.which("uv"):
+        # uv ставит пакеты в интерпретатор, которым запущен установщик
+        cmd = f'uv pip install --python "{sys.executable}" -r requirements.txt'
+    else:
+        # --prefer-binary: готовые wheel вместо сборки из исходников
+        cmd = "pip install --prefer-binary -r requirements.txt"
+    return run_command(cmd, "Установка зависимостей", stream=True)
 
 
 def create_directories():
@@ -59,10 +71,12 @@ def setup_env():
     
     if not Path(".env").exists():
         if Path(".env.example").exists():
-            run_command(
-                "copy .env.example .env",
-                "Создание .env из .env.example"
-            )
+            try:
+                shutil.copyfile(".env.example", ".env")
+            except OSError as e:
+                print(f"❌ Не удалось создать .env из .env.example: {e}")
+                return False
+            print("✅ Создан .env из .env.example")
             print("⚠️ Пожалуйста, отредактируйте .env и добавьте свои API ключи")
         else:
             print("❌ .env.example не найден!")
@@ -77,7 +91,8 @@ def run_tests():
     """Запускает тесты."""
     return run_command(
         "pytest tests/ -v",
-        "Запуск тестов"
+        "Запуск тестов",
+        stream=True,
     )
 
 
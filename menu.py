@@ -1,9 +1,15 @@
 # menu.py
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+# Меню не зависят от пользователя: разметка собирается один раз и переиспользуется
+# (aiogram её только сериализует). Параметрические — кэш по аргументам.
+
 # ========== Общие ==========
 
 
+@lru_cache(maxsize=None)
 def back_home_menu() -> InlineKeyboardMarkup:
     """Кнопки «Назад» и «Домой»."""
     return InlineKeyboardMarkup(
@@ -15,6 +21,7 @@ def back_home_menu() -> InlineKeyboardMarkup:
 
 
 # ========== Главное меню ==========
+@lru_cache(maxsize=None)
 def main_menu() -> InlineKeyboardMarkup:
     """Главное меню: Продажи / Выкупы / Отгрузки + Новые разделы."""
     kb = [
@@ -34,6 +41,7 @@ def main_menu() -> InlineKeyboardMarkup:
 
 
 # ========== Продажи ==========
+@lru_cache(maxsize=None)
 def sales_menu() -> InlineKeyboardMarkup:
     """Меню раздела Продажи (порядок: Цель → План → Факт → Отчёты)."""
     kb = [
@@ -49,6 +57,7 @@ def sales_menu() -> InlineKeyboardMarkup:
 
 
 # ——— Цель продаж
+@lru_cache(maxsize=None)
 def sales_goal_menu() -> InlineKeyboardMarkup:
     """Корень раздела «Цель продаж»: выбор метрики."""
     rows = [
@@ -60,6 +69,7 @@ def sales_goal_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+@lru_cache(maxsize=8)
 def sales_goal_report_menu(horizon: int, metric: str) -> InlineKeyboardMarkup:
     """
     Меню под отчётом «ЦЕЛЬ ПРОДАЖ — РЕКОМЕНДАЦИИ»:
@@ -86,6 +96,7 @@ def sales_goal_report_menu(horizon: int, metric: str) -> InlineKeyboardMarkup:
 
 
 # ========== Факт продаж ==========
+@lru_cache(maxsize=None)
 def facts_metric_menu() -> InlineKeyboardMarkup:
     """Выбор метрики для факта продаж."""
     metrics = [
@@ -104,6 +115,7 @@ def facts_metric_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=kb)
 
 
+@lru_cache(maxsize=16)
 def facts_period_menu(metric: str) -> InlineKeyboardMarkup:
     """Выбор периода для факта продаж."""
     periods = [
@@ -123,6 +135,7 @@ def facts_period_menu(metric: str) -> InlineKeyboardMarkup:
 
 
 # ========== План продаж ==========
+@lru_cache(maxsize=None)
 def plan_metric_menu() -> InlineKeyboardMarkup:
     """Выбор метрики для планов продаж."""
     metrics = [
@@ -139,6 +152,7 @@ def plan_metric_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=kb)
 
 
+@lru_cache(maxsize=16)
 def plan_period_menu(metric: str) -> InlineKeyboardMarkup:
     """Выбор периода для планов продаж."""
     periods = [
@@ -158,6 +172,7 @@ def plan_period_menu(metric: str) -> InlineKeyboardMarkup:
 
 
 # ========== Выкупы ==========
+@lru_cache(maxsize=None)
 def buyouts_menu() -> InlineKeyboardMarkup:
     """Меню раздела Выкупы."""
     kb = [
@@ -169,6 +184,7 @@ def buyouts_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=kb)
 
 
+@lru_cache(maxsize=None)
 def buyouts_need_menu() -> InlineKeyboardMarkup:
     """
     Подменю для экрана «🛒 Необходимо закупить».
@@ -183,6 +199,7 @@ def buyouts_need_menu() -> InlineKeyboardMarkup:
 
 
 # ========== Отгрузки ==========
+@lru_cache(maxsize=None)
 def shipments_menu() -> InlineKeyboardMarkup:
     """Меню раздела Отгрузки."""
     kb = [
@@ -196,43 +213,49 @@ def shipments_menu() -> InlineKeyboardMarkup:
 
 
 # ========== Отгрузки — режимы представления ==========
+_BTN_VIEW_SKU = InlineKeyboardButton(text="🔢 По SKU", callback_data="shipments:view:sku")
+_BTN_VIEW_CLUSTER = InlineKeyboardButton(
+    text="🏢 По кластерам", callback_data="shipments:view:cluster"
+)
+_BTN_VIEW_WAREHOUSE = InlineKeyboardButton(
+    text="🏭 По складам", callback_data="shipments:view:warehouse"
+)
+_BTN_HOME = InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")
+
+
+def _shipments_view_rows(
+    has_cluster: bool, has_warehouse: bool
+) -> list[list[InlineKeyboardButton]]:
+    """Общая шапка «По SKU / По кластерам / По складам» для меню отгрузок."""
+    rows = [[_BTN_VIEW_SKU]]
+    if has_cluster:
+        rows.append([_BTN_VIEW_CLUSTER])
+    if has_warehouse:
+        rows.append([_BTN_VIEW_WAREHOUSE])
+    return rows
+
+
+@lru_cache(maxsize=4)
 def shipments_view_menu(
     has_cluster: bool = True, has_warehouse: bool = True
 ) -> InlineKeyboardMarkup:
     """Кнопки представления данных: по SKU, кластерам, складам."""
-    rows: list[list[InlineKeyboardButton]] = []
-    rows.append([InlineKeyboardButton(text="🔢 По SKU", callback_data="shipments:view:sku")])
-    if has_cluster:
-        rows.append(
-            [InlineKeyboardButton(text="🏢 По кластерам", callback_data="shipments:view:cluster")]
-        )
-    if has_warehouse:
-        rows.append(
-            [InlineKeyboardButton(text="🏭 По складам", callback_data="shipments:view:warehouse")]
-        )
+    rows = _shipments_view_rows(has_cluster, has_warehouse)
     rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="nav:back")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
+    rows.append([_BTN_HOME])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 # ========== Отчёт по отгрузкам ==========
+@lru_cache(maxsize=4)
 def shipments_report_menu(
     has_cluster: bool = True, has_warehouse: bool = True
 ) -> InlineKeyboardMarkup:
     """Подменю внутри «Необходимо отгрузить»."""
-    rows: list[list[InlineKeyboardButton]] = []
-    rows.append([InlineKeyboardButton(text="🔢 По SKU", callback_data="shipments:view:sku")])
-    if has_cluster:
-        rows.append(
-            [InlineKeyboardButton(text="🏢 По кластерам", callback_data="shipments:view:cluster")]
-        )
-    if has_warehouse:
-        rows.append(
-            [InlineKeyboardButton(text="🏭 По складам", callback_data="shipments:view:warehouse")]
-        )
+    rows = _shipments_view_rows(has_cluster, has_warehouse)
     rows.append(
         [InlineKeyboardButton(text="📥 Экспорт в Excel", callback_data="shipments:report:export")]
     )
     rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data="shipments:need")])
-    rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
+    rows.append([_BTN_HOME])
     return InlineKeyboardMarkup(inline_keyboard=rows)
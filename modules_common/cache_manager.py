@@ -1,14 +1,43 @@
 import os
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Callable, Dict, Tuple
 from config_package.json_utils import safe_read_json, safe_write_json
 from config_package import settings
 
+# ── In-memory тень JSON-файлов ───────────────────────────────────────────────
+# path -> ((mtime_ns, size), data). Менеджеры создаются на каждый вызов,
+# поэтому тень общая на модуль. Файл перечитывается только если изменился на диске.
+_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_CACHE_MAX = 32
+
+
+def _file_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _remember(path: str, data: Dict[str, Any]) -> None:
+    sig = _file_sig(path)
+    if sig is None:
+        _CACHE.pop(path, None)
+        return
+    if path not in _CACHE and len(_CACHE) >= _CACHE_MAX:
+        _CACHE.pop(next(iter(_CACHE)))
+    _CACHE[path] = (sig, data)
+
+
 class JsonCacheManager:
     """
     Менеджер для работы с JSON-кэшем.
     Инкапсулирует операции чтения и записи через config_package.json_utils.
+    Разобранный JSON держится в памяти, пока файл не изменится на диске;
+    наружу отдаётся поверхностная копия (вложенные значения менять нельзя).
     """
 
+    __slots__ = ("file_path",)
+
     def __init__(self, file_path: str):
         """
         Args:
@@ -18,36 +47,75 @@ class JsonCacheManager:
 
     def get_data(self) -> Dict[str, Any]:
         """Чтение данных из кэша."""
-        return safe_read_json(self.file_path)
+        path = self.file_path
+        sig = _file_sig(path)
+        if sig is None:
+            _CACHE.pop(path, None)
+            return {}
+        cached = _CACHE.get(path)
+        if cached is not None and cached[0] == sig:
+            return dict(cached[1])
+        data = safe_read_json(path)
+        if not isinstance(data, dict):
+            return data
+        _remember(path, data)
+        return dict(data)
 
     def set_data(self, data: Dict[str, Any]) -> bool:
         """Запись данных в кэш."""
-        return safe_write_json(self.file_path, data)
+        ok = safe_write_json(self.file_path, data)
+        if ok:
+            _remember(self.file_path, dict(data))
+        else:
+            _CACHE.pop(self.file_path, None)
+        return ok
 
-    def update_key(self, key: str, value: Any) -> bool:
-        """Обновление или добавление одного ключа."""
+    def update_keys(self, mapping: Dict[str, Any]) -> bool:
+        """Обновление нескольких ключей за одно чтение и одну запись."""
         data = self.get_data()
-        data[key] = value
+        data.update(mapping)
         return self.set_data(data)
 
+    def update_key(self, key: str, value: Any) -> bool:
+        """Обновление или добавление одного ключа."""
+        return self.update_keys({key: value})
+
     def get_key(self, key: str, default: Any = None) -> Any:
         """Получение значения по ключу."""
         data = self.get_data()
         return data.get(key, default)
 
 
+# Менеджеры — по сути синглтоны на путь; путь зависит только от settings.base_dir,
+# поэтому пересобираем менеджер, лишь если base_dir поменяли на лету.
+_MANAGERS: Dict[str, Tuple[Any, JsonCacheManager]] = {}
+
+
+def _manager(name: str, path_fn: Callable[[], str]) -> JsonCacheManager:
+    base = settings.base_dir
+    hit = _MANAGERS.get(name)
+    if hit is not None and hit[0] == base:
+        return hit[1]
+    mgr = JsonCacheManager(path_fn())
+    _MANAGERS[name] = (base, mgr)
+    return mgr
+
+
 class SalesCache:
     """Обертка для специфичных путей кэша продаж."""
     
     @staticmethod
     def get_forecast_prefs_manager() -> JsonCacheManager:
-        path = os.path.join(settings.sales_cache_dir, "forecast_method.json")
-        return JsonCacheManager(path)
+        return _manager(
+            "forecast_prefs",
+            lambda: os.path.join(settings.sales_cache_dir, "forecast_method.json"),
+        )
 
     @staticmethod
     def get_facts_cache_manager() -> JsonCacheManager:
-        path = os.path.join(settings.sales_cache_dir, "facts_cache.json")
-        return JsonCacheManager(path)
+        return _manager(
+            "facts_cache", lambda: os.path.join(settings.sales_cache_dir, "facts_cache.json")
+        )
 
 
 class WarehouseCache:
@@ -56,5 +124,7 @@ class WarehouseCache:
     @staticmethod
     def get_prefs_manager() -> JsonCacheManager:
         # Используем shipments_cache_dir (нужно добавить его в settings, если нет, или вычислить)
-        path = os.path.join(settings.shipments_cache_dir, "common", "warehouse_prefs.json")
-        return JsonCacheManager(path)
+        return _manager(
+            "warehouse_prefs",
+            lambda: os.path.join(settings.shipments_cache_dir, "common", "warehouse_prefs.json"),
+        )
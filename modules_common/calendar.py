@@ -4,9 +4,11 @@
 from __future__ import annotations
 
 import os
+import time
 import calendar as _py_calendar
+from functools import lru_cache
 from datetime import datetime, timedelta, date as date_cls
-from typing import List, Optional, Iterable, Set, Union, Tuple
+from typing import Iterator, List, Optional, Tuple, Union
 
 from aiogram import types
 from aiogram.fsm.context import FSMContext
@@ -25,12 +27,52 @@ except Exception:
 
 _DEFAULT_PREFIX = os.getenv("CB_PREFIX_DEFAULT", "mon").strip() or "mon"
 
+# «Сегодня» в TZ: кэшируем на минуту, чтобы не собирать aware-datetime на каждую отрисовку
+_TODAY_TTL_SEC = 60.0
+_today_cache: Tuple[float, date_cls] = (float("-inf"), date_cls.min)
+
+
+def _today() -> date_cls:
+    global _today_cache
+    t = time.monotonic()
+    if t - _today_cache[0] > _TODAY_TTL_SEC:
+        _today_cache = (t, datetime.now(TZ).date())
+    return _today_cache[1]
+
 
 def _month_title(year: int, month: int) -> str:
     months = ["Янв", "Фев", "Мар", "Апр", "Май", "Июн", "Июл", "Авг", "Сен", "Окт", "Ноя", "Дек"]
     return f"{months[month - 1]} {year}"
 
 
+# Сетка месяца зависит только от (year, month) — строим один раз и переиспользуем
+_MONTH_CAL = _py_calendar.Calendar(firstweekday=_py_calendar.MONDAY)
+
+# Префикс подписи клетки по индексу (is_today << 1) | is_selected
+_CELL_PREFIX = ("", "🔷", "🔶", "🔶🔷")
+
+
+@lru_cache(maxsize=256)
+def _month_grid(
+    year: int, month: int, pad: bool = False
+) -> Tuple[Tuple[Tuple[str, str], ...], ...]:
+    """
+    Недели месяца как кортежи (day_text, iso).
+    pad=False — соседние месяцы добиваются реальными датами (monthdatescalendar);
+    pad=True — пустые клетки отдаются как ("", "") (monthdayscalendar).
+    """
+    weeks = []
+    for week in _MONTH_CAL.monthdatescalendar(year, month):
+        cells = []
+        for d in week:
+            if pad and d.month != month:
+                cells.append(("", ""))
+            else:
+                cells.append((str(d.day), d.isoformat()))
+        weeks.append(tuple(cells))
+    return tuple(weeks)
+
+
 def _to_date(val: Union[str, datetime, date_cls, None]) -> Optional[date_cls]:
     if val is None:
         return None
@@ -52,13 +94,70 @@ def _to_date(val: Union[str, datetime, date_cls, None]) -> Optional[date_cls]:
     return None
 
 
-def _to_date_set(values: Optional[Iterable[Union[str, datetime, date_cls]]]) -> Set[date_cls]:
-    out: Set[date_cls] = set()
-    for v in values or []:
-        d = _to_date(v)
-        if d:
-            out.add(d)
-    return out
+@lru_cache(maxsize=16)
+def _weekday_row(prefix: str) -> Tuple[InlineKeyboardButton, ...]:
+    """Строка «Пн … Вс» — зависит только от префикса callback'ов."""
+    noop = f"{prefix}:noop"
+    return tuple(
+        InlineKeyboardButton(text=t, callback_data=noop)
+        for t in ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+    )
+
+
+@lru_cache(maxsize=64)
+def _nav_row(prefix: str, year: int, month: int) -> Tuple[InlineKeyboardButton, ...]:
+    """Шапка «◀️ Месяц Год ▶️» для build_calendar_kb."""
+    prev_y, prev_m = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_y, next_m = (year + 1, 1) if month == 12 else (year, month + 1)
+    return (
+        InlineKeyboardButton(text="◀️", callback_data=f"{prefix}:date:nav:{prev_y}:{prev_m}"),
+        InlineKeyboardButton(text=_month_title(year, month), callback_data=f"{prefix}:noop"),
+        InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:date:nav:{next_y}:{next_m}"),
+    )
+
+
+def _iso_key(val: Union[str, datetime, date_cls, None]) -> str:
+    """
+    Дешёвая нормализация к 'YYYY-MM-DD' для сравнения строками с клетками сетки.
+    Уже нормализованные строки (их кладёт show_calendar) проходят без разбора даты.
+    """
+    if isinstance(val, str):
+        s = val.strip()
+        if len(s) >= 10 and s[4] == "-" and s[7] == "-" and (len(s) == 10 or s[10] == "T"):
+            return s[:10]
+    d = _to_date(val)
+    return d.isoformat() if d else ""
+
+
+def _iter_calendar_rows(
+    year: int,
+    month: int,
+    *,
+    prefix: str,
+    pick_cb_pfx: str,
+    today_iso: str,
+    sel_iso: frozenset = frozenset(),
+    lo_iso: str = "",
+    hi_iso: str = "",
+    pad: bool = False,
+) -> Iterator[Tuple[InlineKeyboardButton, ...]]:
+    """
+    Общее тело обоих календарей: строка дней недели + недели месяца.
+    Клетка выделена, если её ISO в sel_iso или в [lo_iso; hi_iso]
+    (пустые границы дают пустой диапазон). pad=True — пустые клетки «·».
+    """
+    yield _weekday_row(prefix)
+    noop_cb = f"{prefix}:noop"
+    for week in _month_grid(year, month, pad):
+        row_btns: List[InlineKeyboardButton] = []
+        for day_num, iso in week:
+            if not iso:
+                row_btns.append(InlineKeyboardButton(text="·", callback_data=noop_cb))
+                continue
+            is_selected = iso in sel_iso or lo_iso <= iso <= hi_iso
+            label = _CELL_PREFIX[((iso == today_iso) << 1) | is_selected] + day_num
+            row_btns.append(InlineKeyboardButton(text=label, callback_data=pick_cb_pfx + iso))
+        yield tuple(row_btns)
 
 
 def build_calendar_kb(
@@ -77,25 +176,7 @@ def build_calendar_kb(
     kb = InlineKeyboardBuilder()
 
     # Шапка: навигация по месяцам
-    prev_y, prev_m = (year - 1, 12) if month == 1 else (year, month - 1)
-    next_y, next_m = (year + 1, 1) if month == 12 else (year, month + 1)
-    kb.row(
-        InlineKeyboardButton(text="◀️", callback_data=f"{prefix}:date:nav:{prev_y}:{prev_m}"),
-        InlineKeyboardButton(text=_month_title(year, month), callback_data=f"{prefix}:noop"),
-        InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:date:nav:{next_y}:{next_m}"),
-    )
-
-    # Дни недели
-    kb.row(
-        *[
-            InlineKeyboardButton(text=t, callback_data=f"{prefix}:noop")
-            for t in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        ]
-    )
-
-    sel_dates_dt = _to_date_set(sel_dates)
-    pf = _to_date(p_from)
-    pt = _to_date(p_to)
+    kb.row(*_nav_row(prefix, year, month))
 
     mode_norm = (mode or "period").lower()
     if mode_norm not in ("dates", "period", "multiple", "single"):
@@ -103,37 +184,31 @@ def build_calendar_kb(
     if mode_norm == "multiple":
         mode_norm = "dates"
 
-    today = datetime.now(TZ).date()
-    cal = _py_calendar.Calendar(firstweekday=_py_calendar.MONDAY)
-
-    for week in cal.monthdatescalendar(year, month):
-        row_btns = []
-        for cur_date in week:
-            day_num = f"{cur_date.day}"
-            date_str = cur_date.isoformat()
-
-            if mode_norm == "dates":
-                is_selected = cur_date in sel_dates_dt
-            else:
-                if pf and pt:
-                    lo, hi = (pf, pt) if pf <= pt else (pt, pf)
-                    is_selected = lo <= cur_date <= hi
-                else:
-                    is_selected = (pf == cur_date) or (pt == cur_date)
-
-            is_today = cur_date == today
-
-            prefix_icon = ""
-            if is_today:
-                prefix_icon += "🔶"
-            if is_selected:
-                prefix_icon += "🔷"
-
-            label = f"{prefix_icon}{day_num}"
-            cb = f"{prefix}:date:pick:{date_str}"
-            row_btns.append(InlineKeyboardButton(text=label, callback_data=cb))
-
-        kb.row(*row_btns)
+    # Всё сравнение — по ISO-строкам (YYYY-MM-DD сравнивается лексикографически)
+    lo_iso = hi_iso = ""
+    if mode_norm == "dates":
+        sel_iso = frozenset(_iso_key(v) for v in sel_dates or ())
+    else:
+        pf = _to_date(p_from)
+        pt = _to_date(p_to)
+        if pf and pt:
+            sel_iso = frozenset()
+            lo_iso, hi_iso = sorted((pf.isoformat(), pt.isoformat()))
+        else:
+            # выбран только один край периода
+            sel_iso = frozenset(d.isoformat() for d in (pf, pt) if d)
+
+    for row in _iter_calendar_rows(
+        year,
+        month,
+        prefix=prefix,
+        pick_cb_pfx=f"{prefix}:date:pick:",
+        today_iso=_today().isoformat(),
+        sel_iso=sel_iso,
+        lo_iso=lo_iso,
+        hi_iso=hi_iso,
+    ):
+        kb.row(*row)
 
     if mode_norm == "dates":
         kb.row(
@@ -159,13 +234,24 @@ def build_calendar_kb(
     return kb.as_markup()
 
 
-async def show_calendar(msg: types.Message, state: FSMContext, *, prefix: Optional[str] = None):
+async def show_calendar(
+    msg: types.Message,
+    state: FSMContext,
+    *,
+    prefix: Optional[str] = None,
+    skip_unchanged: bool = False,
+):
+    """
+    Рисует календарь в msg по состоянию FSM.
+    skip_unchanged=True — для нажатий внутри самого календаря: если отпечаток входных
+    данных совпал с последней отрисовкой этого сообщения, edit_text не отправляем.
+    """
     data = await state.get_data()
     mode = (data.get("date_mode") or "period").lower()
     if mode not in ("dates", "period"):
         mode = "period"
 
-    now = datetime.now(TZ)
+    today = _today()
 
     raw_sel = data.get("date_sel")
     if isinstance(raw_sel, str):
@@ -183,11 +269,8 @@ async def show_calendar(msg: types.Message, state: FSMContext, *, prefix: Option
         if d:
             sel_norm.append(d.isoformat())
 
-    # Без ограничений — просто оставляем выбранные значения как есть
-    await state.update_data(date_sel=sel_norm)
-
-    year = int(data.get("cal_year") or 0) or now.year
-    month = int(data.get("cal_month") or 0) or now.month
+    year = int(data.get("cal_year") or 0) or today.year
+    month = int(data.get("cal_month") or 0) or today.month
 
     p_from = data.get("date_from")
     p_to = data.get("date_to")
@@ -198,6 +281,29 @@ async def show_calendar(msg: types.Message, state: FSMContext, *, prefix: Option
         data.get("cal_header")
         or "📅 Выбор периода\nВыделите диапазон дат (🔶 — сегодня, 🔷 — выделено)."
     )
+
+    # Отпечаток всего, что влияет на текст/клавиатуру (включая «сегодня» и само сообщение)
+    fp = hash(
+        (
+            getattr(msg.chat, "id", None),
+            msg.message_id,
+            header,
+            mode,
+            year,
+            month,
+            tuple(sel_norm),
+            p_from,
+            p_to,
+            back_cb_from_state,
+            prefix,
+            today.toordinal(),
+        )
+    )
+    if skip_unchanged and data.get("cal_fp") == fp:
+        return
+
+    # Без ограничений — просто оставляем выбранные значения как есть
+    await state.update_data(date_sel=sel_norm, cal_fp=fp)
     try:
         await msg.edit_text(
             header,
@@ -213,24 +319,27 @@ async def show_calendar(msg: types.Message, state: FSMContext, *, prefix: Option
             ),
             parse_mode="HTML",
         )
-    except TelegramBadRequest as e:
-        if "message is not modified" not in str(e).lower():
-            raise
+    except Exception as e:
+        if isinstance(e, TelegramBadRequest) and "message is not modified" in str(e).lower():
+            return
+        # отрисовка не дошла — отпечаток недействителен
+        await state.update_data(cal_fp=None)
+        raise
 
 
 # ---------- Обработчики callback’ов календаря ----------
 async def handle_date_switch(cb: types.CallbackQuery, state: FSMContext):
-    parts = (cb.data or "").split(":")
-    prefix = parts[0] if parts else _DEFAULT_PREFIX
-    now = datetime.now(TZ)
-    mode = parts[-1]
+    data = cb.data or ""
+    prefix = data.partition(":")[0]
+    today = _today()
+    mode = data.rpartition(":")[2]
     await state.update_data(
         date_mode=("dates" if mode == "dates" else "period"),
         date_sel=[],
         date_from=None,
         date_to=None,
-        cal_year=now.year,
-        cal_month=now.month,
+        cal_year=today.year,
+        cal_month=today.month,
         host_msg_id=cb.message.message_id,
         cb_prefix=prefix,
     )
@@ -239,11 +348,12 @@ async def handle_date_switch(cb: types.CallbackQuery, state: FSMContext):
 
 
 async def handle_date_nav(cb: types.CallbackQuery, state: FSMContext):
-    parts = (cb.data or "").split(":")
-    prefix = parts[0] if parts else _DEFAULT_PREFIX
+    data = cb.data or ""
+    prefix = data.partition(":")[0]
     try:
-        y = int(parts[-2])
-        m = int(parts[-1])
+        y_str, m_str = data.rsplit(":", 2)[-2:]
+        y = int(y_str)
+        m = int(m_str)
     except Exception:
         return await cb.answer()
 
@@ -255,8 +365,7 @@ async def handle_date_nav(cb: types.CallbackQuery, state: FSMContext):
 
 
 async def handle_date_clear(cb: types.CallbackQuery, state: FSMContext):
-    parts = (cb.data or "").split(":")
-    prefix = parts[0] if parts else _DEFAULT_PREFIX
+    prefix = (cb.data or "").partition(":")[0]
     data = await state.get_data()
     await state.update_data(
         date_sel=[],
@@ -267,14 +376,14 @@ async def handle_date_clear(cb: types.CallbackQuery, state: FSMContext):
         host_msg_id=cb.message.message_id,
         cb_prefix=prefix,
     )
-    await show_calendar(cb.message, state, prefix=prefix)
+    await show_calendar(cb.message, state, prefix=prefix, skip_unchanged=True)
     await cb.answer("Сброшено")
 
 
 async def handle_date_pick(cb: types.CallbackQuery, state: FSMContext):
-    parts = (cb.data or "").split(":")
-    prefix = parts[0] if parts else _DEFAULT_PREFIX
-    date_str = parts[-1]
+    raw = cb.data or ""
+    prefix = raw.partition(":")[0]
+    date_str = raw.rpartition(":")[2]
     data = await state.get_data()
     mode = (data.get("date_mode") or "period").lower()
     if mode not in ("dates", "period"):
@@ -325,7 +434,7 @@ async def handle_date_pick(cb: types.CallbackQuery, state: FSMContext):
             cb_prefix=prefix,
         )
 
-    await show_calendar(cb.message, state, prefix=prefix)
+    await show_calendar(cb.message, state, prefix=prefix, skip_unchanged=True)
     await cb.answer()
 
 
@@ -347,16 +456,27 @@ def shipments_calendar_kb(
       cancel:     <prefix>:cancel
     Работает только с выбором одной даты (selected).
     """
-    from datetime import date as _date
-    import calendar as _cal
-
-    today = datetime.now(TZ).date()
+    today = _today()
     sel_dt = _to_date(selected)
 
     if year is None or month is None:
         base = sel_dt or today
         year, month = base.year, base.month
 
+    return _shipments_calendar_markup(
+        prefix, year, month, sel_dt.isoformat() if sel_dt else "", today.isoformat()
+    )
+
+
+@lru_cache(maxsize=128)
+def _shipments_calendar_markup(
+    prefix: str, year: int, month: int, sel_iso: str, today_iso: str
+) -> types.InlineKeyboardMarkup:
+    """
+    Готовая разметка shipments_calendar_kb. Аргументы уже нормализованы, «сегодня» входит
+    в ключ; разметку никто не мутирует (_calendar_with_clear копирует строки), поэтому
+    один объект можно отдавать всем вызывающим.
+    """
     kb = InlineKeyboardBuilder()
 
     # Шапка
@@ -366,35 +486,16 @@ def shipments_calendar_kb(
         InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:next"),
     )
 
-    # Дни недели
-    kb.row(
-        *[
-            InlineKeyboardButton(text=t, callback_data=f"{prefix}:noop")
-            for t in ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
-        ]
-    )
-
-    cal = _cal.Calendar(firstweekday=_cal.MONDAY)
-    for week in cal.monthdayscalendar(year, month):
-        row_btns: List[InlineKeyboardButton] = []
-        for day in week:
-            if day == 0:
-                row_btns.append(InlineKeyboardButton(text="·", callback_data=f"{prefix}:noop"))
-                continue
-            cur = _date(year, month, day)
-            mark = ""
-            if cur == today:
-                mark += "🔶"
-            if sel_dt and cur == sel_dt:
-                mark += "🔷"
-            label = f"{mark}{day}"
-            row_btns.append(
-                InlineKeyboardButton(
-                    text=label,
-                    callback_data=f"{prefix}:pick:{cur.isoformat()}",
-                )
-            )
-        kb.row(*row_btns)
+    for row in _iter_calendar_rows(
+        year,
+        month,
+        prefix=prefix,
+        pick_cb_pfx=f"{prefix}:pick:",
+        today_iso=today_iso,
+        sel_iso=frozenset((sel_iso,)) if sel_iso else frozenset(),
+        pad=True,
+    ):
+        kb.row(*row)
 
     # Действия (подтверждение / отмена)
     kb.row(
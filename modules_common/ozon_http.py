@@ -0,0 +1,46 @@
+# modules_common/ozon_http.py
+# Общая aiohttp-сессия для коротких запросов к Ozon Seller API
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+log = logging.getLogger("seller-bot.ozon_http")
+
+# Одна сессия на event loop: переиспользуем TCP/TLS-соединения и DNS-кэш между запросами
+_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Ленивая общая ClientSession. Закрывать её вызывающему НЕ нужно —
+    закрывается один раз при остановке бота (close_session).
+    Если сессия закрыта или создана в другом loop — создаём новую.
+    """
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=30),
+        )
+        _SESSION_LOOP = loop
+    return _SESSION
+
+
+async def close_session() -> None:
+    """Закрыть общую сессию (вызывается при остановке бота)."""
+    global _SESSION, _SESSION_LOOP
+    session, _SESSION, _SESSION_LOOP = _SESSION, None, None
+    if session is not None and not session.closed:
+        try:
+            await session.close()
+        except Exception as e:
+            log.debug(f"Failed to close shared HTTP session: {e}")
+
+
+__all__ = ["get_session", "close_session"]
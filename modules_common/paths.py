@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
 from typing import Optional
 
 from dotenv import load_dotenv
@@ -11,31 +12,42 @@ from dotenv import load_dotenv
 # Поднимаемся к корню репозитория (seller-bot/)
 BASE_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 
-# Грузим .env из корня (повторный вызов load_dotenv безопасен)
-load_dotenv(os.path.join(BASE_DIR, ".env"))
+# Грузим .env из корня один раз: флаг в окружении наследуют и дочерние процессы,
+# которым незачем заново разбирать тот же файл
+if not os.getenv("PATHS_DOTENV_LOADED"):
+    load_dotenv(f"{BASE_DIR}{os.sep}.env")
+    os.environ["PATHS_DOTENV_LOADED"] = "1"
 
 # ── Директории данных ────────────────────────────────────────────────────────
 # Разрешаем переопределение DATA_DIR из окружения (по умолчанию BASE/data)
-DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+# Статические подкаталоги собираем f-строками — это выполняется на каждом старте
+DATA_DIR = os.getenv("DATA_DIR", f"{BASE_DIR}{os.sep}data")
 
-CACHE_DIR = os.path.join(DATA_DIR, "cache")
-CACHE_PUR = os.path.join(CACHE_DIR, "purchases")
-CACHE_SHIP = os.path.join(CACHE_DIR, "shipments")
-CACHE_SALES = os.path.join(CACHE_DIR, "sales")
-CACHE_COMMON = os.path.join(CACHE_DIR, "common")
+CACHE_DIR = f"{DATA_DIR}{os.sep}cache"
+CACHE_PUR = f"{CACHE_DIR}{os.sep}purchases"
+CACHE_SHIP = f"{CACHE_DIR}{os.sep}shipments"
+CACHE_SALES = f"{CACHE_DIR}{os.sep}sales"
+CACHE_COMMON = f"{CACHE_DIR}{os.sep}common"
 
-LOGS_DIR = os.path.join(DATA_DIR, "logs")
-TMP_DIR = os.path.join(DATA_DIR, "tmp")
+LOGS_DIR = f"{DATA_DIR}{os.sep}logs"
+TMP_DIR = f"{DATA_DIR}{os.sep}tmp"
 
 # ── Вспомогательные утилиты ─────────────────────────────────────────────────
 
 
 def _is_writable_dir(path: str) -> bool:
     """
-    Проверяем, можно ли писать в каталог: пытаемся создать и удалить временный файл.
+    Проверяем, можно ли писать в каталог: создаём его и спрашиваем права через access()
+    (без создания/удаления пробного файла). Пробный файл пишем, только если access()
+    ответил «нет» — на NFS/с ACL он бывает неточен.
     """
     try:
         os.makedirs(path, exist_ok=True)
+    except OSError:
+        return False
+    if os.access(path, os.W_OK | os.X_OK):
+        return True
+    try:
         test_path = os.path.join(path, ".wtest")
         with open(test_path, "w", encoding="utf-8") as f:
             f.write("ok")
@@ -45,16 +57,8 @@ def _is_writable_dir(path: str) -> bool:
         return False
 
 
-def resolve_reports_dir() -> str:
-    """
-    Выбираем каталог для отчётов по приоритетам:
-        1) REPORTS_DIR из .env (если задан и доступен на запись)
-        2) <DATA_DIR>/reports
-        3) /tmp/seller-bot-reports
-        4) <CWD>/data/reports
-        5) Текущая директория "."
-    Возвращает первый доступный для записи путь (создаёт при необходимости).
-    """
+@lru_cache(maxsize=None)
+def _probe_reports_dir() -> str:
     candidates = []
 
     env_dir = os.getenv("REPORTS_DIR")
@@ -73,18 +77,39 @@ def resolve_reports_dir() -> str:
     return "."
 
 
+def resolve_reports_dir() -> str:
+    """
+    Выбираем каталог для отчётов по приоритетам:
+        1) REPORTS_DIR из .env (если задан и доступен на запись)
+        2) <DATA_DIR>/reports
+        3) /tmp/seller-bot-reports
+        4) <CWD>/data/reports
+        5) Текущая директория "."
+    Возвращает первый доступный для записи путь (создаёт при необходимости).
+    Перебор кандидатов выполняется один раз за процесс; дальше только убеждаемся,
+    что выбранный каталог не удалили (иначе выбираем заново).
+    """
+    d = _probe_reports_dir()
+    try:
+        os.makedirs(d, exist_ok=True)
+    except OSError:
+        _probe_reports_dir.cache_clear()
+        d = _probe_reports_dir()
+    return d
+
+
 # ── Каталог отчётов (единая «истина») ───────────────────────────────────────
-REPORTS_DIR = resolve_reports_dir()
+# REPORTS_DIR / REPORTS / SHIPMENTS_REPORT_XLSX вычисляются лениво (см. __getattr__ ниже):
+# импорт модуля не трогает файловую систему.
 
 # ── Файлы по ТЗ 5.0/5.1 ─────────────────────────────────────────────────────
 # 1) Кэш управленческого «📊 Отчёта по продажам»
-SALES_REPORT_CACHE = os.path.join(CACHE_SALES, "sales_report_cache.json")
+SALES_REPORT_CACHE = f"{CACHE_SALES}{os.sep}sales_report_cache.json"
 
 # 2) Имя XLSX «📊 Отчёт по отгрузкам» (можно переопределить через .env)
 #    В .env переменная SHIPMENTS_REPORT_XLSX должна содержать ИМЯ файла (не путь).
 #    Полный путь собираем через REPORTS_DIR.
 SHIPMENTS_REPORT_XLSX_NAME = os.getenv("SHIPMENTS_REPORT_XLSX", "shipments_report.xlsx")
-SHIPMENTS_REPORT_XLSX = os.path.join(REPORTS_DIR, os.path.basename(SHIPMENTS_REPORT_XLSX_NAME))
 
 # 3) Имя файла закупок (из .env, по умолчанию «Товары.xlsx»)
 PURCHASES_XLSX_NAME = os.getenv("PURCHASES_XLSX_NAME", "Товары.xlsx")
@@ -113,38 +138,53 @@ def shipments_report_xlsx_path(name: Optional[str] = None) -> str:
     (или дефолт 'shipments_report.xlsx') и собираем путь на основе актуального
     REPORTS_DIR, определённого resolve_reports_dir().
     """
-    base_name = (
-        name or os.getenv("SHIPMENTS_REPORT_XLSX") or os.path.basename(SHIPMENTS_REPORT_XLSX)
-    ).strip()
+    base_name = (name or os.getenv("SHIPMENTS_REPORT_XLSX") or SHIPMENTS_REPORT_XLSX_NAME).strip()
     base_name = os.path.basename(base_name) or "shipments_report.xlsx"
-    return os.path.join(REPORTS_DIR, base_name)
+    return os.path.join(resolve_reports_dir(), base_name)
 
 
 def ensure_dirs() -> None:
     """
     Создать (если нет) все директории данных/кэшей/логов/отчётов.
+    Родители идут раньше детей, поэтому хватает одного mkdir на каталог;
+    makedirs — только если не хватает предка вне списка (первый запуск).
     """
-    for p in [
+    dirs = {
         DATA_DIR,
         CACHE_DIR,
         CACHE_PUR,
         CACHE_SHIP,
         CACHE_SALES,
         CACHE_COMMON,
-        REPORTS_DIR,
+        resolve_reports_dir(),
         LOGS_DIR,
         TMP_DIR,
-    ]:
-        os.makedirs(p, exist_ok=True)
+    }
+    for p in sorted(dirs, key=len):
+        try:
+            os.mkdir(p)
+        except FileExistsError:
+            pass
+        except FileNotFoundError:
+            os.makedirs(p, exist_ok=True)
 
 
 # ── Удобные алиасы для обратной совместимости ───────────────────────────────
 DATA = DATA_DIR
 CACHE = CACHE_DIR
-REPORTS = REPORTS_DIR
 TMP = TMP_DIR
 LOGS = LOGS_DIR
 
+
+def __getattr__(name: str) -> str:
+    # Ленивые константы, зависящие от resolve_reports_dir()
+    if name in ("REPORTS_DIR", "REPORTS"):
+        return resolve_reports_dir()
+    if name == "SHIPMENTS_REPORT_XLSX":
+        return os.path.join(resolve_reports_dir(), os.path.basename(SHIPMENTS_REPORT_XLSX_NAME))
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "BASE_DIR",
     "DATA_DIR",
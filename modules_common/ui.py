@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config_package import settings
 from modules_sales import services as sales_services
@@ -18,10 +20,16 @@ def welcome_text() -> str:
 
 # ── Keyboards ────────────────────────────────────────────────────────────────
 
+# Клавиатуры ниже не зависят от пользователя — собираем один раз (или по ключу-галочке)
+_MAIN_MENU_CACHED = None
+
 def build_main_menu_kb() -> InlineKeyboardMarkup:
+    global _MAIN_MENU_CACHED
+    if _MAIN_MENU_CACHED is not None:
+        return _MAIN_MENU_CACHED
     try:
         from menu import main_menu
-        return main_menu()
+        return main_menu()  # уже кэширован в menu.py
     except ImportError:
         pass
         
@@ -30,8 +38,10 @@ def build_main_menu_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="🏷️ Выкупы", callback_data="buyouts")],
         [InlineKeyboardButton(text="🚚 Отгрузки", callback_data="shipments")],
     ]
-    return InlineKeyboardMarkup(inline_keyboard=rows)
+    _MAIN_MENU_CACHED = InlineKeyboardMarkup(inline_keyboard=rows)
+    return _MAIN_MENU_CACHED
 
+@lru_cache(maxsize=1)
 def home_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")]]
@@ -40,7 +50,10 @@ def home_kb() -> InlineKeyboardMarkup:
 # ── Sales / Method ───────────────────────────────────────────────────────────
 
 def build_method_kb() -> InlineKeyboardMarkup:
-    current_code = sales_services.get_forecast_method()
+    return _method_kb(sales_services.get_forecast_method())
+
+@lru_cache(maxsize=16)
+def _method_kb(current_code: str) -> InlineKeyboardMarkup:
     methods = dict(sales_services.list_forecast_methods())
 
     rows = []
@@ -74,6 +87,7 @@ def get_wh_prefs():
     p = int(data.get("period") or 90)
     return m, p
 
+@lru_cache(maxsize=32)
 def build_warehouse_kb(method: str, period: int) -> InlineKeyboardMarkup:
     # rows logic similar to main.py
     m_rows = []
@@ -133,24 +147,39 @@ def _label_for_notice(code: str) -> str:
     # Simply lookup for now
     return NOTICE_TITLES.get(code, code)
 
+# Строки кнопок уведомлений: (label, callback_data), уже отфильтрованные по NOTICE_REGISTRY.
+# Версия — размер реестра: пересобираем, только если его поменяли на лету.
+_NOTICE_BTN_ROWS: tuple = (-1, [])
+
+
+def _notice_btn_rows() -> list:
+    global _NOTICE_BTN_ROWS
+    ver = len(NOTICE_REGISTRY)
+    if _NOTICE_BTN_ROWS[0] != ver:
+        rows = [
+            [(_label_for_notice(code), f"notice:send:{code}") for code in pair if code in NOTICE_REGISTRY]
+            for pair in NOTICE_ORDER
+        ]
+        _NOTICE_BTN_ROWS = (ver, [r for r in rows if r])
+    return _NOTICE_BTN_ROWS[1]
+
 def build_notice_kb() -> InlineKeyboardMarkup:
+    IKB = InlineKeyboardButton
+    short_title = settings.notice_digest_short_title
+    full_title = settings.notice_digest_title
     rows = []
     # Digests
-    rows.append([InlineKeyboardButton(text=settings.notice_digest_short_title, callback_data="notice:send:short")])
-    rows.append([InlineKeyboardButton(text=settings.notice_digest_title, callback_data="notice:send:all")])
+    rows.append([IKB(text=short_title, callback_data="notice:send:short")])
+    rows.append([IKB(text=full_title, callback_data="notice:send:all")])
 
-    for pair in NOTICE_ORDER:
-        btns = []
-        for code in pair:
-            if code in NOTICE_REGISTRY:
-                btns.append(InlineKeyboardButton(text=_label_for_notice(code), callback_data=f"notice:send:{code}"))
-        if btns: rows.append(btns)
+    rows.extend([IKB(text=label, callback_data=cb) for label, cb in pair] for pair in _notice_btn_rows())
 
     rows.append([InlineKeyboardButton(text="Напоминание об Excel", callback_data="notice:send:seller_reminder")])
     rows.append([InlineKeyboardButton(text="ℹ️ Список кодов", callback_data="notice:list")])
     rows.append([InlineKeyboardButton(text="🏠 Домой", callback_data="nav:home")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
+@lru_cache(maxsize=1)
 def codes_list_text() -> str:
     lines = []
     seen = set()
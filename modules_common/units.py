@@ -3,14 +3,14 @@ from __future__ import annotations
 import os
 import html as _html
 import asyncio
-from typing import Dict, List, Tuple, Set
+from typing import Dict, FrozenSet, List, Optional, Tuple, Set
 
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.enums import ParseMode
 
-import aiohttp
+from modules_common.ozon_http import get_session
 
 # ── где искать .env: сначала корень проекта, затем рядом с модулем ───────────
 MOD_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -31,10 +31,27 @@ _PAGE_MAX = 3600  # безопасный размер одной страниц
 # ─────────────────────────────────────────────────────────────────────────────
 
 
+# Разобранный .env и производный от него набор WATCH_OFFERS: перечитываем файл,
+# только если у него сменились mtime/размер (дальше — один os.stat на вызов)
+_ENV_CACHE: Dict[str, object] = {"path": None, "sig": None, "data": {}}
+_WATCH_CACHE: Dict[str, object] = {"key": None, "value": frozenset()}
+
+
+def _env_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
 def _read_env_file(path: str) -> Dict[str, str]:
+    sig = _env_sig(path)
+    if sig is None:
+        return {}
+    if _ENV_CACHE["path"] == path and _ENV_CACHE["sig"] == sig:
+        return _ENV_CACHE["data"]  # type: ignore[return-value]
     out: Dict[str, str] = {}
-    if not os.path.exists(path):
-        return out
     try:
         with open(path, "r", encoding="utf-8") as f:
             for line in f:
@@ -46,16 +63,21 @@ def _read_env_file(path: str) -> Dict[str, str]:
     except Exception:
         # тихо возвращаем пустоту — команда /units не должна падать
         pass
+    _ENV_CACHE.update(path=path, sig=sig, data=out)
     return out
 
 
-def _watch_offers_from_env() -> Set[str]:
+def _watch_offers_from_env() -> FrozenSet[str]:
     env = _read_env_file(ENV_PATH)
     raw = env.get("WATCH_OFFERS", "") or os.getenv("WATCH_OFFERS", "") or ""
+    if _WATCH_CACHE["key"] == raw:
+        return _WATCH_CACHE["value"]  # type: ignore[return-value]
     # убираем пустые элементы и пробелы
     vals = {s.strip() for s in raw.split(",") if s.strip()}
     # экранируем HTML-символы, чтобы не ломать ParseMode.HTML
-    return {_html.escape(v) for v in vals}
+    value = frozenset(_html.escape(v) for v in vals)
+    _WATCH_CACHE.update(key=raw, value=value)
+    return value
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -63,7 +85,7 @@ def _watch_offers_from_env() -> Set[str]:
 # ─────────────────────────────────────────────────────────────────────────────
 
 
-def _all_offers() -> List[str]:
+async def _all_offers() -> List[str]:
     """
     Возвращает объединённый список офферов:
     • из WATCH_OFFERS;
@@ -79,29 +101,26 @@ def _all_offers() -> List[str]:
     if client_id and api_key:
         try:
             url = "https://api-seller.ozon.ru/v3/product/list"
+            headers = {
+                "Client-Id": client_id,
+                "Api-Key": api_key,
+                "Content-Type": "application/json",
+            }
             last_id = ""
-            async with aiohttp.ClientSession() as session:
-                while True:
-                    body = {"filter": {"visibility": "ALL"}, "last_id": last_id, "limit": 1000}
-                    async with session.post(
-                        url,
-                        headers={
-                            "Client-Id": client_id,
-                            "Api-Key": api_key,
-                            "Content-Type": "application/json",
-                        },
-                        json=body,
-                    ) as r:
-                        r.raise_for_status()
-                        js = await r.json() or {}
-                        items = (js.get("result") or {}).get("items") or []
-                        for it in items:
-                            off = str(it.get("offer_id") or "").strip()
-                            if off:
-                                offers.add(_html.escape(off))
-                        last_id = str((js.get("result") or {}).get("last_id") or "")
-                        if not items or not last_id:
-                            break
+            session = await get_session()
+            while True:
+                body = {"filter": {"visibility": "ALL"}, "last_id": last_id, "limit": 1000}
+                async with session.post(url, headers=headers, json=body) as r:
+                    r.raise_for_status()
+                    js = await r.json() or {}
+                    items = (js.get("result") or {}).get("items") or []
+                    for it in items:
+                        off = str(it.get("offer_id") or "").strip()
+                        if off:
+                            offers.add(_html.escape(off))
+                    last_id = str((js.get("result") or {}).get("last_id") or "")
+                    if not items or not last_id:
+                        break
         except Exception:
             # молча игнорируем — это вспомогательный источник
             pass
@@ -1,23 +1,31 @@
 from __future__ import annotations
+import asyncio
 import logging
+import random
 import datetime as dt
+from itertools import chain
 from typing import Dict, List, Any, Optional
 
 import aiohttp
+
 from config_package import settings
+from modules_common.ozon_http import get_session
 
 log = logging.getLogger("seller-bot.finance")
 
 # Константы
 OZON_API_URL_FINANCE = "https://api-seller.ozon.ru/v3/finance/transaction/list"
+_PAGES_CONCURRENCY = 8  # одновременных запросов страниц (лимиты API)
+_PAGE_RETRIES = 4  # попыток на страницу (429 / сеть / 5xx)
+_RETRY_BASE_PAUSE = 0.5
+_RETRY_MAX_PAUSE = 8.0
 
 # Хелперы
-def _headers() -> Dict[str, str]:
-    return {
-        "Client-Id": settings.ozon_client_id,
-        "Api-Key": settings.ozon_api_key,
-        "Content-Type": "application/json",
-    }
+_HEADERS: Dict[str, str] = {
+    "Client-Id": settings.ozon_client_id,
+    "Api-Key": settings.ozon_api_key,
+    "Content-Type": "application/json",
+}
 
 async def fetch_transactions(
     date_from: dt.datetime, 
@@ -46,15 +54,73 @@ async def fetch_transactions(
     if transaction_type == "all":
         payload["filter"]["transaction_type"] = "ALL"
 
-    async with aiohttp.ClientSession() as session:
+    try:
+        session = await get_session()
+        first = await _fetch_page(session, payload, 1)
+    except Exception as e:
+        log.error(f"Error fetching finance: {e}")
+        return []
+
+    # Остальные страницы — параллельно (page_count приходит в первом ответе)
+    page_count = int(first.get("page_count") or 1)
+    if page_count <= 1:
+        return first.get("operations", [])
+
+    sem = asyncio.Semaphore(_PAGES_CONCURRENCY)
+
+    async def _page(page: int) -> List[dict]:
+        async with sem:
+            return (await _fetch_page(session, payload, page)).get("operations", [])
+
+    # Итоги по неполному списку занижены — поэтому страница, не отдавшаяся после
+    # всех попыток, валит весь запрос так же, как ошибка первой страницы
+    tasks = [asyncio.ensure_future(_page(p)) for p in range(2, page_count + 1)]
+    try:
+        rest = await asyncio.gather(*tasks)
+    except Exception as e:
+        for t in tasks:
+            t.cancel()
+        log.error(f"Error fetching finance pages (of {page_count}): {e}")
+        return []
+    return list(chain(first.get("operations", []), chain.from_iterable(rest)))
+
+
+async def _sleep_with_backoff(attempt: int, retry_after_header: Optional[str]) -> None:
+    if retry_after_header:
+        try:
+            pause = float(retry_after_header)
+        except Exception:
+            pause = None
+        if pause is not None:
+            await asyncio.sleep(min(pause, _RETRY_MAX_PAUSE))
+            return
+    base = min(_RETRY_BASE_PAUSE * (2 ** max(0, attempt - 1)), _RETRY_MAX_PAUSE)
+    await asyncio.sleep(base + base * random.uniform(0.0, 0.25))
+
+
+async def _fetch_page(session: Any, payload: Dict[str, Any], page: int) -> Dict[str, Any]:
+    """Одна страница; 429 / 5xx / сетевые ошибки повторяем, последняя неудача — исключение."""
+    attempt = 0
+    while True:
+        attempt += 1
+        can_retry = attempt < _PAGE_RETRIES
         try:
-            async with session.post(OZON_API_URL_FINANCE, headers=_headers(), json=payload) as r:
-                r.raise_for_status()
-                data = await r.json()
-                return data.get("result", {}).get("operations", [])
-        except Exception as e:
-            log.error(f"Error fetching finance: {e}")
-            return []
+            async with session.post(
+                OZON_API_URL_FINANCE, headers=_HEADERS, json={**payload, "page": page}
+            ) as r:
+                if can_retry and (r.status == 429 or r.status >= 500):
+                    log.warning(f"Finance page {page}: HTTP {r.status}, attempt {attempt}")
+                    retry_after = r.headers.get("Retry-After")
+                else:
+                    r.raise_for_status()
+                    data = await r.json()
+                    return data.get("result", {})
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if not can_retry:
+                raise
+            log.warning(f"Finance page {page}: {e!r}, attempt {attempt}")
+            retry_after = None
+        await _sleep_with_backoff(attempt, retry_after)
 
 def calc_summary(transactions: List[dict]) -> Dict[str, float]:
     """Считает итоги по транзакциям."""
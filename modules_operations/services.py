@@ -3,19 +3,18 @@ import logging
 import asyncio
 from typing import List, Dict, Any
 
-import aiohttp
 from config_package import settings
+from modules_common.ozon_http import get_session
 
 log = logging.getLogger("seller-bot.operations")
 
 OZON_API_URL_PRICES = "https://api-seller.ozon.ru/v4/product/info/prices"
 
-def _headers() -> Dict[str, str]:
-    return {
-        "Client-Id": settings.ozon_client_id,
-        "Api-Key": settings.ozon_api_key,
-        "Content-Type": "application/json",
-    }
+_HEADERS: Dict[str, str] = {
+    "Client-Id": settings.ozon_client_id,
+    "Api-Key": settings.ozon_api_key,
+    "Content-Type": "application/json",
+}
 
 async def fetch_prices(skus: List[int] = None) -> List[dict]:
     """
@@ -36,12 +35,12 @@ async def fetch_prices(skus: List[int] = None) -> List[dict]:
         "limit": 1000
     }
     
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(OZON_API_URL_PRICES, headers=_headers(), json=payload) as r:
-                r.raise_for_status()
-                data = await r.json()
-                return data.get("result", {}).get("items", [])
-        except Exception as e:
-            log.error(f"Error fetching prices: {e}")
-            return []
+    try:
+        session = await get_session()
+        async with session.post(OZON_API_URL_PRICES, headers=_HEADERS, json=payload) as r:
+            r.raise_for_status()
+            data = await r.json()
+            return data.get("result", {}).get("items", [])
+    except Exception as e:
+        log.error(f"Error fetching prices: {e}")
+        return []
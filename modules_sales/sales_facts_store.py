@@ -35,6 +35,8 @@ OZON_API_URL: str = settings.ozon_api_url
 
 # ---------- алиасы из .env ----------
 _ALIAS_CACHE: Dict[int, str] = {}
+# отдельный флаг: пустой словарь (алиасы не заданы) — тоже результат сборки
+_ALIAS_BUILT: bool = False
 
 
 def _watch_skus_order_list() -> List[int]:
@@ -152,6 +154,7 @@ def _build_alias_cache() -> None:
         2) ALIAS_<SKU>=<alias> (построчно)
         3) WATCH_SKU="sku:alias" (дополняем, если алиаса ещё нет)
     """
+    global _ALIAS_BUILT
     _ALIAS_CACHE.clear()
 
     # 1) ALIAS="ALIAS_183=xxx,1831342958=yyy,..."
@@ -171,11 +174,19 @@ def _build_alias_cache() -> None:
     for sku, alias in _apply_aliases_from_watch_sku().items():
         _ALIAS_CACHE.setdefault(sku, alias)
 
+    _ALIAS_BUILT = True
     print(f"[sales_facts_store] alias cache built for {len(_ALIAS_CACHE)} sku")
 
 
+def clear_alias_cache() -> None:
+    """Сбросить алиасы — следующий get_alias_for_sku перечитает окружение."""
+    global _ALIAS_BUILT
+    _ALIAS_CACHE.clear()
+    _ALIAS_BUILT = False
+
+
 def get_alias_for_sku(sku: int) -> str | None:
-    if not _ALIAS_CACHE:
+    if not _ALIAS_BUILT:
         _build_alias_cache()
     return _ALIAS_CACHE.get(int(sku))
 
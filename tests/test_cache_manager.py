@@ -0,0 +1,62 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from modules_common import cache_manager
+from modules_common.cache_manager import JsonCacheManager
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"a": 1}), encoding="utf-8")
+    yield str(path)
+    cache_manager._CACHE.pop(str(path), None)
+
+
+def test_repeated_reads_parse_file_once(cache_file):
+    mgr = JsonCacheManager(cache_file)
+    with patch(
+        "modules_common.cache_manager.safe_read_json", wraps=cache_manager.safe_read_json
+    ) as read:
+        assert mgr.get_data() == {"a": 1}
+        assert JsonCacheManager(cache_file).get_data() == {"a": 1}
+        assert read.call_count == 1
+
+
+def test_returned_dict_is_a_copy(cache_file):
+    mgr = JsonCacheManager(cache_file)
+    data = mgr.get_data()
+    data["b"] = 2
+    assert mgr.get_data() == {"a": 1}
+
+
+def test_external_change_is_picked_up(cache_file):
+    mgr = JsonCacheManager(cache_file)
+    assert mgr.get_data() == {"a": 1}
+
+    sig = cache_manager._file_sig(cache_file)
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump({"a": 2}, f)
+    os.utime(cache_file, ns=(0, sig[0] + 1_000_000))
+
+    assert mgr.get_data() == {"a": 2}
+
+
+def test_set_data_refreshes_shadow(cache_file):
+    mgr = JsonCacheManager(cache_file)
+    mgr.get_data()
+    assert mgr.update_keys({"b": 2, "c": 3})
+    with patch("modules_common.cache_manager.safe_read_json") as read:
+        assert mgr.get_data() == {"a": 1, "b": 2, "c": 3}
+        read.assert_not_called()
+
+
+def test_missing_file_drops_shadow(cache_file):
+    mgr = JsonCacheManager(cache_file)
+    mgr.get_data()
+    os.remove(cache_file)
+    assert mgr.get_data() == {}
+    assert cache_file not in cache_manager._CACHE
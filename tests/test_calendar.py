@@ -0,0 +1,69 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from modules_common import calendar
+
+
+def _msg(message_id: int = 5) -> MagicMock:
+    msg = MagicMock()
+    msg.chat.id = 1
+    msg.message_id = message_id
+    msg.edit_text = AsyncMock()
+    return msg
+
+
+@pytest.fixture
+async def state() -> FSMContext:
+    st = FSMContext(MemoryStorage(), StorageKey(bot_id=1, chat_id=1, user_id=1))
+    await st.update_data(date_mode="dates", cal_year=2025, cal_month=3)
+    return st
+
+
+@pytest.mark.asyncio
+async def test_skip_unchanged_does_not_redraw(state):
+    msg = _msg()
+    await calendar.show_calendar(msg, state, prefix="sr")
+    await calendar.show_calendar(msg, state, prefix="sr", skip_unchanged=True)
+    assert msg.edit_text.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_skip_unchanged_redraws_after_change(state):
+    msg = _msg()
+    await calendar.show_calendar(msg, state, prefix="sr")
+    await state.update_data(date_sel=["2025-03-03"])
+    await calendar.show_calendar(msg, state, prefix="sr", skip_unchanged=True)
+    assert msg.edit_text.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_skip_unchanged_is_per_message(state):
+    await calendar.show_calendar(_msg(5), state, prefix="sr")
+    other = _msg(6)
+    await calendar.show_calendar(other, state, prefix="sr", skip_unchanged=True)
+    assert other.edit_text.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_default_always_redraws(state):
+    msg = _msg()
+    await calendar.show_calendar(msg, state, prefix="sr")
+    await calendar.show_calendar(msg, state, prefix="sr")
+    assert msg.edit_text.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_edit_resets_fingerprint(state):
+    msg = _msg()
+    msg.edit_text.side_effect = RuntimeError("network")
+    with pytest.raises(RuntimeError):
+        await calendar.show_calendar(msg, state, prefix="sr")
+    assert (await state.get_data()).get("cal_fp") is None
+
+    msg.edit_text.side_effect = None
+    await calendar.show_calendar(msg, state, prefix="sr", skip_unchanged=True)
+    assert msg.edit_text.await_count == 2
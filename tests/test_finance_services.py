@@ -0,0 +1,109 @@
+import datetime as dt
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from modules_common import ozon_http
+from modules_finance import services
+
+
+def _app(handler) -> web.Application:
+    app = web.Application()
+    app.router.add_post("/fin", handler)
+    return app
+
+
+@pytest.fixture
+async def finance_server(monkeypatch):
+    """Поднимает локальный сервер вместо Ozon; handler задаёт сам тест."""
+    servers = []
+
+    async def start(handler):
+        server = TestServer(_app(handler))
+        await server.start_server()
+        servers.append(server)
+        monkeypatch.setattr(services, "OZON_API_URL_FINANCE", str(server.make_url("/fin")))
+        return server
+
+    monkeypatch.setattr(services, "_RETRY_BASE_PAUSE", 0.01)
+    yield start
+    await ozon_http.close_session()
+    for server in servers:
+        await server.close()
+
+
+async def _fetch():
+    now = dt.datetime.now()
+    return await services.fetch_transactions(now - dt.timedelta(days=1), now)
+
+
+@pytest.mark.asyncio
+async def test_pages_merged_in_order(finance_server):
+    async def handler(request):
+        page = (await request.json())["page"]
+        ops = [{"id": f"{page}-{i}"} for i in range(2)]
+        return web.json_response({"result": {"operations": ops, "page_count": 5}})
+
+    await finance_server(handler)
+    ids = [tx["id"] for tx in await _fetch()]
+    assert ids == [f"{p}-{i}" for p in range(1, 6) for i in range(2)]
+
+
+@pytest.mark.asyncio
+async def test_single_page(finance_server):
+    async def handler(request):
+        return web.json_response({"result": {"operations": [{"id": 1}], "page_count": 1}})
+
+    await finance_server(handler)
+    assert await _fetch() == [{"id": 1}]
+
+
+@pytest.mark.asyncio
+async def test_flaky_page_is_retried(finance_server):
+    calls = {}
+
+    async def handler(request):
+        page = (await request.json())["page"]
+        calls[page] = calls.get(page, 0) + 1
+        if page == 3 and calls[page] <= 2:
+            return web.Response(status=429 if calls[page] == 1 else 503)
+        return web.json_response({"result": {"operations": [{"id": page}], "page_count": 4}})
+
+    await finance_server(handler)
+    assert [tx["id"] for tx in await _fetch()] == [1, 2, 3, 4]
+    assert calls[3] == 3
+
+
+@pytest.mark.asyncio
+async def test_lost_page_fails_whole_fetch(finance_server):
+    calls = {}
+
+    async def handler(request):
+        page = (await request.json())["page"]
+        calls[page] = calls.get(page, 0) + 1
+        if page == 3:
+            return web.Response(status=503)
+        return web.json_response({"result": {"operations": [{"id": page}], "page_count": 4}})
+
+    await finance_server(handler)
+    assert await _fetch() == []  # неполный список не отдаём — итоги были бы занижены
+    assert calls[3] == services._PAGE_RETRIES
+
+
+@pytest.mark.asyncio
+async def test_client_error_is_not_retried(finance_server):
+    calls = []
+
+    async def handler(request):
+        calls.append((await request.json())["page"])
+        return web.Response(status=403)
+
+    await finance_server(handler)
+    assert await _fetch() == []
+    assert calls == [1]
+
+
+def test_calc_summary():
+    summary = services.calc_summary([{"amount": 100}, {"amount": -30.5}, {"amount": None}])
+    assert summary == {"income": 100.0, "expense": -30.5, "total": 69.5}
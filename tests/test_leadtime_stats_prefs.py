@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+import handlers.handlers_shipments_leadtime_stats as lts
+
+
+@pytest.fixture
+def prefs_path(tmp_path, monkeypatch):
+    path = tmp_path / "lead_stats_prefs.json"
+    monkeypatch.setattr(lts, "_PREFS_PATH", str(path))
+    monkeypatch.setattr(lts, "_PREFS_CACHE", None)
+    monkeypatch.setattr(lts, "_PREFS_EPOCH", 0)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_keep_both_fields(prefs_path, monkeypatch):
+    # растягиваем read-modify-write, чтобы без замка второй писатель прочитал старый файл
+    orig_read = lts._read_prefs_sync
+
+    def slow_read():
+        d = orig_read()
+        time.sleep(0.05)
+        return d
+
+    monkeypatch.setattr(lts, "_read_prefs_sync", slow_read)
+
+    await asyncio.gather(lts._write_prefs(period=90), lts._write_prefs(allocate_by_qty=False))
+
+    on_disk = json.loads(prefs_path.read_text(encoding="utf-8"))
+    assert on_disk["period"] == 90
+    assert on_disk["allocate_by_qty"] is False
+    assert lts._PREFS_EPOCH == 2
+
+
+@pytest.mark.asyncio
+async def test_write_is_atomic_and_cached(prefs_path):
+    await lts._write_prefs(period=360)
+
+    assert os.listdir(prefs_path.parent) == [prefs_path.name]  # временных файлов не осталось
+    assert lts._PREFS_CACHE is not None
+    assert lts._PREFS_CACHE[0] == os.stat(prefs_path).st_mtime_ns
+    assert (await lts._read_prefs())["period"] == 360
+
+
+@pytest.mark.asyncio
+async def test_external_edit_invalidates_cache(prefs_path):
+    await lts._write_prefs(period=90)
+    prefs_path.write_text(json.dumps({"period": 180}), encoding="utf-8")
+    os.utime(prefs_path, ns=(0, lts._PREFS_CACHE[0] + 1_000_000))
+
+    assert (await lts._read_prefs())["period"] == 180
+
+
+def test_failed_replace_removes_temp_file(prefs_path, monkeypatch):
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(lts.os, "replace", broken_replace)
+
+    lts._write_prefs_sync(period=90)
+
+    assert os.listdir(prefs_path.parent) == []
+    assert lts._PREFS_CACHE is None
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import handlers.handlers_shipments_need as need
+
+
+@pytest.fixture
+def closed_state(tmp_path, monkeypatch):
+    """Изолированное состояние закрытых складов: свой файл, свой _STATE, без фонового писателя."""
+    path = tmp_path / "closed_warehouses.json"
+    path.write_text(json.dumps({"closed": [], "updated_at": None}), encoding="utf-8")
+    monkeypatch.setattr(need, "CLOSED_WH_PATH", str(path))
+    monkeypatch.setattr(
+        need,
+        "_STATE",
+        {
+            "dispatch": {"days": 0},
+            "closed": set(),
+            "closed_frozen": None,
+            "closed_rev": 0,
+            "closed_updated_at": None,
+        },
+    )
+    monkeypatch.setattr(need, "_DIRTY", {})
+    monkeypatch.setattr(need, "_FLUSHER", {"task": None, "event": None})
+
+    # compute_need читает закрытые склады с диска — как и настоящий расчёт
+    def fake_compute(scope, **kwargs):
+        return {"closed": json.loads(path.read_text(encoding="utf-8"))["closed"]}
+
+    monkeypatch.setattr(need, "compute_need", fake_compute)
+    need._cache_invalidate()
+    yield path
+    task = need._FLUSHER["task"]
+    if task is not None:
+        task.cancel()
+    need._cache_invalidate()
+
+
+@pytest.mark.asyncio
+async def test_toggle_then_compute_sees_new_set(closed_state):
+    need._toggle_closed_wid(3)
+    data = await need._need_data("all", 0)
+    assert data["closed"] == [3]
+    assert "closed" not in need._DIRTY
+
+
+@pytest.mark.asyncio
+async def test_compute_during_inflight_flush_sees_new_set(closed_state, monkeypatch):
+    """Фоновый сброс уже в потоке, но файл ещё не записан — расчёт всё равно видит новый набор."""
+    orig_write = need._write_json
+
+    def slow_write(path, payload):
+        time.sleep(0.2)
+        orig_write(path, payload)
+
+    monkeypatch.setattr(need, "_write_json", slow_write)
+
+    need._toggle_closed_wid(3)
+    flush = asyncio.create_task(need._flush_dirty())
+    await asyncio.sleep(0.05)  # сброс стартовал и ждёт в потоке
+
+    data = await need._need_data("all", 0)
+    assert data["closed"] == [3]
+    await flush
+    assert not need._DIRTY
+
+
+@pytest.mark.asyncio
+async def test_change_during_write_stays_dirty(closed_state, monkeypatch):
+    orig_write = need._write_json
+
+    def slow_write(path, payload):
+        time.sleep(0.1)
+        orig_write(path, payload)
+
+    monkeypatch.setattr(need, "_write_json", slow_write)
+
+    need._toggle_closed_wid(3)
+    flush = asyncio.create_task(need._flush_dirty())
+    await asyncio.sleep(0.02)
+    need._toggle_closed_wid(4)  # изменение после снимка — метка должна пережить запись
+    await flush
+    assert "closed" in need._DIRTY
+
+    await need._flush_dirty()
+    assert json.loads(closed_state.read_text(encoding="utf-8"))["closed"] == [3, 4]